@@ -1,10 +1,17 @@
-from flask import Flask, render_template, request, redirect, url_for
+import time
+from flask import Flask, Response, abort, g, jsonify, render_template, request, redirect, url_for
 from src.api import get_previous_matches, get_future_matches
+from src import helper
+from src import metrics
+from src import snapshot
+from src.cache import ResultCache
 from src.elo_system import EloRatingSystem
+from src.jobs import JobQueue
 from src.sim import Simulator
-from src.migration import migrate_fixtures_to_sqlite, migrate_future_to_sqlite
+from src.migration import migrate_fixtures_to_sqlite, migrate_future_to_sqlite, migrate_schema
 
 app = Flask(__name__)
+migrate_schema()
 
 LEAGUES = {
     103: "Eliteserien",
@@ -15,6 +22,40 @@ LEAGUE_IDS = [103, 104]
 
 SEASONS = [2023, 2024, 2025]
 
+SIMULATIONS = 100
+
+MAX_SIMULATIONS = 1_000_000 # Upper bound for a background simulation job
+
+# Keyed by data version, so a fetch that changes matches or standings invalidates everything
+RESULT_CACHE = ResultCache(maxsize=64, ttl=24 * 3600)
+
+JOB_QUEUE = JobQueue(max_workers=2)
+
+@app.before_request
+def start_request_instrumentation():
+    if metrics.ENABLED:
+        g.request_start = time.perf_counter()
+    if metrics.PROFILER and request.endpoint != 'metrics_endpoint':
+        g.profiler = metrics.RequestProfiler()
+        g.profiler.start()
+
+@app.after_request
+def finish_request_instrumentation(response):
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        path = profiler.stop(request.endpoint or 'unknown')
+        response.headers['X-Profile-Path'] = path
+    if metrics.ENABLED and 'request_start' in g:
+        metrics.observe('http_request', time.perf_counter() - g.request_start, endpoint=request.endpoint or 'unknown')
+        metrics.inc('http_responses', endpoint=request.endpoint or 'unknown', status=response.status_code)
+    return response
+
+@app.route('/metrics')
+def metrics_endpoint():
+    if not metrics.ENABLED:
+        abort(404)
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/')
 def home():
     print("🔥 Home route reached")
@@ -33,22 +74,78 @@ def fetch_data(league_id):
 
 @app.route('/league/<int:league_id>/elo')
 def generate_elo(league_id):
-    elo = EloRatingSystem(LEAGUE_IDS)
-    elo.run_elo_rating_system()
-    leaderboard = sorted(elo.team_ratings.items(), key=lambda x: x[1], reverse=True)
+    def compute():
+        elo = EloRatingSystem(LEAGUE_IDS, incremental=True)
+        elo.run_elo_rating_system()
+        return sorted(elo.team_ratings.items(), key=lambda x: x[1], reverse=True)
+
+    # The leaderboard covers all of LEAGUE_IDS whichever league page asks, so every page shares one entry
+    key = ('elo', tuple(LEAGUE_IDS), helper.get_data_version())
+    leaderboard = RESULT_CACHE.get_or_compute(key, compute)
     return render_template("leaderboard.html", leaderboard=leaderboard, league_id=league_id, league_name=LEAGUES.get(league_id))
 
 @app.route('/league/<int:league_id>/sim')
 def simulate_season(league_id):
-    sim = Simulator(league_id)
-    results = sim.simulate_season_return_avg_points(100)
+    key = ('sim', league_id, SIMULATIONS, helper.get_data_version())
+    results = RESULT_CACHE.get_or_compute(
+        key, lambda: Simulator(league_id, elo_model=snapshot.load_or_fit(league_id)).simulate_season_return_avg_points(SIMULATIONS)
+    )
     labels = list(results.keys())
     data = list(results.values())
-    return render_template("simulation_result.html",
+    return render_template("simulation_results.html",
                            league_id=league_id,
                            league_name=LEAGUES.get(league_id),
                            labels=labels,
                            data=data)
 
+@app.route('/league/<int:league_id>/probabilities')
+def match_probabilities(league_id):
+    season = request.args.get('season')
+    round_name = request.args.get('round')
+    key = ('probabilities', league_id, season, round_name, helper.get_data_version())
+    fixtures = RESULT_CACHE.get_or_compute(
+        key, lambda: Simulator(league_id, elo_model=snapshot.load_or_fit(league_id)).price_future_matches(season, round_name)
+    )
+    return jsonify({'league_id': league_id, 'fixtures': fixtures})
+
+def _parse_int(value):
+    """value as an int, or None if it is not an integer (bools and fractional numbers included)."""
+    if isinstance(value, bool) or isinstance(value, float) and not value.is_integer():
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+@app.route('/league/<int:league_id>/sim/jobs', methods=['POST'])
+def submit_simulation_job(league_id):
+    params = request.get_json(silent=True) or request.form
+    simulations = _parse_int(params.get('simulations', SIMULATIONS))
+    if simulations is None or not 0 < simulations <= MAX_SIMULATIONS:
+        return jsonify({'error': f"'simulations' must be a positive integer up to {MAX_SIMULATIONS}"}), 400
+    seed = params.get('seed')
+    if seed is not None:
+        seed = _parse_int(seed)
+        if seed is None or seed < 0:
+            return jsonify({'error': "'seed' must be a non-negative integer"}), 400
+    job_id = JOB_QUEUE.submit(league_id, simulations, seed)
+    return jsonify(JOB_QUEUE.get(job_id)), 202, {'Location': url_for('get_job', job_id=job_id)}
+
+@app.route('/jobs/<int:job_id>')
+def get_job(job_id):
+    job = JOB_QUEUE.get(job_id)
+    if job is None:
+        abort(404)
+    return jsonify(job)
+
+@app.route('/jobs/<int:job_id>', methods=['DELETE'])
+@app.route('/jobs/<int:job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    if JOB_QUEUE.get(job_id) is None:
+        abort(404)
+    if not JOB_QUEUE.cancel(job_id):
+        return jsonify(JOB_QUEUE.get(job_id)), 409
+    return jsonify(JOB_QUEUE.get(job_id)), 202
+
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,99 @@
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src import db
+from src.migration import migrate_fixtures_to_sqlite, migrate_schema
+
+"""
+Throughput of the fixture import path.
+
+Generates a synthetic multi-league backfill and writes it to a fresh database twice:
+once row by row with one execute per fixture on a plain connection with SQLite's
+defaults (rollback journal, synchronous=FULL), as the old migrate_fixtures_to_sqlite
+did, and once through the current bulk path (WAL, synchronous=NORMAL).
+
+Usage:
+    python benchmarks/bench_import.py --fixtures 50000
+"""
+
+
+def synthetic_fixtures(n_fixtures, teams_per_league=16, leagues=(103, 104, 105)):
+    """{league_id: {season: {round: [fixture, ...]}}} with n_fixtures fixtures in total."""
+    per_league = {league_id: {} for league_id in leagues}
+    start = date(1990, 1, 1)
+    for i in range(n_fixtures):
+        league_id = leagues[i % len(leagues)]
+        n = i // len(leagues)
+        season = str(1990 + n // 240)
+        rnd = str(n % 240 // 8 + 1)
+        home, away = n % teams_per_league, (n * 7 + 3) % teams_per_league
+        if home == away:
+            away = (away + 1) % teams_per_league
+        home_score, away_score = n % 4, n % 3
+        per_league[league_id].setdefault(season, {}).setdefault(rnd, []).append({
+            "date": (start + timedelta(days=n // 8)).isoformat() + f"T{n % 8 + 12:02d}:00:00+00:00",
+            "home_team": f"TEAM {league_id}-{home}",
+            "away_team": f"TEAM {league_id}-{away}",
+            "score": {"home": home_score, "away": away_score},
+            "result": "Home" if home_score > away_score else "Away" if home_score < away_score else "Draw",
+        })
+    return per_league
+
+
+def row_by_row_import(league_id, fixtures, db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode = DELETE") # migrate_schema switched the file to WAL
+    conn.execute("PRAGMA synchronous = FULL")
+    c = conn.cursor()
+    for season, rounds in fixtures.items():
+        for round_name, games in rounds.items():
+            for game in games:
+                c.execute('''
+                    INSERT INTO matches (
+                        league_id, season, round, date, home_team, away_team, home_score, away_score, result
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (league_id, season, round_name, game["date"], game["home_team"], game["away_team"],
+                      game["score"]["home"], game["score"]["away"], game["result"]))
+    conn.commit()
+    conn.close()
+
+
+def run(import_fn, per_league, n_fixtures):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        migrate_schema(db_path)
+        db.get_manager(db_path).close() # Leaving WAL needs the only open connection
+        try:
+            start = time.perf_counter()
+            for league_id, fixtures in per_league.items():
+                import_fn(league_id, fixtures, db_path)
+            elapsed = time.perf_counter() - start
+        finally:
+            db.get_manager(db_path).close()
+        conn = sqlite3.connect(db_path)
+        rows = conn.execute("SELECT COUNT(*) FROM matches").fetchone()[0]
+        conn.close()
+    assert rows == n_fixtures, f"expected {n_fixtures} rows, found {rows}"
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the fixture import path.")
+    parser.add_argument("--fixtures", type=int, default=50_000)
+    args = parser.parse_args()
+
+    per_league = synthetic_fixtures(args.fixtures)
+    for name, import_fn in [("row by row", row_by_row_import), ("bulk", migrate_fixtures_to_sqlite)]:
+        elapsed = run(import_fn, per_league, args.fixtures)
+        print(f"{name:<12} {elapsed:8.2f} s  {args.fixtures / elapsed:12,.0f} fixtures/s")
+
+
+if __name__ == "__main__":
+    main()
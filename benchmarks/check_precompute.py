@@ -0,0 +1,130 @@
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src import helper
+from src.elo_system import EloRatingSystem
+
+"""
+Tolerance check and timing for the memoized decay and expected-score helpers.
+
+Compares helper.get_log_age, get_decay_factor, get_decay_table and expected_scores against
+the exact formulas they replace, over random match dates, k factors and ratings. Exits
+non-zero if any value is further than --tolerance from the exact one. tests/test_precompute.py
+runs the same check under pytest.
+
+Usage:
+    python benchmarks/check_precompute.py --samples 100000
+"""
+
+
+def exact_log_age(game_date_str, use_fixed_reference_date=False):
+    game_date = datetime.fromisoformat(game_date_str).date()
+    reference_date = date(2024, 12, 10) if use_fixed_reference_date else datetime.now().date()
+    days = max((reference_date - game_date).days, 1)
+    return math.log(days + 10)
+
+
+def exact_expected_score(rating_a, rating_b, home_field_advantage):
+    exponent = (rating_b - rating_a + home_field_advantage) / 400
+    return 1 / (1 + 10 ** exponent)
+
+
+def random_dates(rng, n, n_distinct=5000):
+    start = date(1995, 1, 1)
+    distinct = [
+        (start + timedelta(days=rng.randrange(30 * 365))).isoformat() + f"T{rng.randrange(12, 22):02d}:00:00+02:00"
+        for _ in range(n_distinct)
+    ]
+    return [rng.choice(distinct) for _ in range(n)]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def max_errors(dates, k_factors, rating_a, rating_b, advantage):
+    """{helper: max abs error against the exact formula} over the given samples."""
+    errors = {}
+
+    def check(name, diffs):
+        errors[name] = float(np.max(np.abs(diffs))) if len(diffs) else 0.0
+
+    for fixed in (True, False):
+        label = "fixed" if fixed else "today"
+        check(f"get_log_age ({label})",
+              [helper.get_log_age(d, fixed) - exact_log_age(d, fixed) for d in dates])
+        check(f"get_decay_factor ({label})",
+              [helper.get_decay_factor(k, d, fixed) - k / exact_log_age(d, fixed) for k, d in zip(k_factors, dates)])
+        table = helper.get_decay_table(3, dates, fixed)
+        check(f"get_decay_table ({label})", [table[d] - 3 / exact_log_age(d, fixed) for d in dates])
+
+    vectorized = helper.expected_scores(rating_a, rating_b, advantage)
+    exact = [exact_expected_score(a, b, h) for a, b, h in zip(rating_a.tolist(), rating_b.tolist(), advantage.tolist())]
+    check("expected_scores", vectorized - np.array(exact))
+    elo = EloRatingSystem.__new__(EloRatingSystem) # The method only needs self, not a loaded model
+    check("calculate_expected_score", [
+        elo.calculate_expected_score(a, b, h) - e
+        for a, b, h, e in zip(rating_a.tolist(), rating_b.tolist(), advantage.tolist(), exact)
+    ])
+    return errors
+
+
+def random_samples(n, seed=0):
+    """(dates, k_factors, rating_a, rating_b, advantage) with n random values each."""
+    rng = random.Random(seed)
+    dates = random_dates(rng, n)
+    k_factors = [rng.choice([1, 3, 20, 32.5]) for _ in range(n)]
+    np_rng = np.random.default_rng(seed)
+    rating_a = np_rng.normal(1500, 200, n)
+    rating_b = np_rng.normal(1500, 200, n)
+    advantage = np_rng.normal(50, 40, n)
+    return dates, k_factors, rating_a, rating_b, advantage
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check memoized decay and expected scores against the exact formulas.")
+    parser.add_argument("--samples", type=int, default=100_000)
+    parser.add_argument("--tolerance", type=float, default=1e-12)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    dates, k_factors, rating_a, rating_b, advantage = random_samples(args.samples, args.seed)
+    failures = []
+    for name, worst in max_errors(dates, k_factors, rating_a, rating_b, advantage).items():
+        status = "ok" if worst <= args.tolerance else "FAIL"
+        print(f"{name:<28} max abs error {worst:.3e}  {status}")
+        if status == "FAIL":
+            failures.append(name)
+
+    print()
+    exact_time = timed(lambda: [k / exact_log_age(d) for k, d in zip(k_factors, dates)])
+    memo_time = timed(lambda: [helper.get_decay_factor(k, d) for k, d in zip(k_factors, dates)])
+    table = helper.get_decay_table(3, dates)
+    table_time = timed(lambda: [table[d] for d in dates])
+    print(f"decay exact     {args.samples / exact_time:14,.0f} lookups/s")
+    print(f"decay memoized  {args.samples / memo_time:14,.0f} lookups/s")
+    print(f"decay table     {args.samples / table_time:14,.0f} lookups/s")
+
+    scalar_time = timed(lambda: [exact_expected_score(a, b, h) for a, b, h in
+                                 zip(rating_a.tolist(), rating_b.tolist(), advantage.tolist())])
+    vector_time = timed(lambda: helper.expected_scores(rating_a, rating_b, advantage))
+    print(f"expected scalar {args.samples / scalar_time:14,.0f} scores/s")
+    print(f"expected array  {args.samples / vector_time:14,.0f} scores/s")
+
+    if failures:
+        sys.exit(f"Outside tolerance {args.tolerance:g}: {', '.join(failures)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from benchmarks.synthetic import build_database
+from src import db
+from src.data_manager import DataManager
+from src.elo_system import EloRatingSystem
+from src.sim import Simulator
+
+"""
+Benchmark suite for the model's hot paths.
+
+For each synthetic league size (teams x seasons, see benchmarks/synthetic.py) it measures:
+- get_fixtures: loading history through DataManager.get_fixtures (matches/s)
+- init_form: EloRatingSystem.init_form over the loaded history (matches/s)
+- elo_replay: a full process_season replay, i.e. process_game per match (matches/s)
+- h2h: building the head-to-head index and looking up every pair of teams (lookups/s)
+- sim_scalar / sim_vectorized: Simulator season outcomes (sims/s)
+
+Times are the best of --repeat runs. Peak memory is taken in a separate run under
+tracemalloc, which slows Python code down, so it never affects the timings.
+
+Results can be saved and later compared against, so a change can be checked for regressions:
+    python benchmarks/run_benchmarks.py --save baseline.json
+    python benchmarks/run_benchmarks.py --compare baseline.json
+"""
+
+DEFAULT_SIZES = "16x1,64x10,200x30"
+
+
+def parse_size(size):
+    teams, seasons = size.lower().split("x")
+    return int(teams), int(seasons)
+
+
+def measure(fn, repeat, memory=True):
+    """Best wall time of repeat runs and peak traced memory in MB. fn returns the work count."""
+    best, count = float("inf"), 0
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            count = fn()
+            best = min(best, time.perf_counter() - start)
+
+    peak_mb = None
+    if memory:
+        tracemalloc.start()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                fn()
+            peak_mb = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        finally:
+            tracemalloc.stop()
+
+    return best, count, peak_mb
+
+
+def bench_size(n_teams, n_seasons, args):
+    """Run every benchmark against a fresh synthetic database. Returns {benchmark: result}."""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        info = build_database(db_path, n_teams, n_seasons, seed=args.seed)
+        db.set_default_db_path(db_path)
+        league_ids = info["league_ids"]
+        n_matches = info["matches"]
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            elo = EloRatingSystem(league_ids)
+        teams = sorted(elo.team_ratings)
+
+        def get_fixtures():
+            DataManager(league_ids, db_path).get_fixtures()
+            return n_matches
+
+        def init_form():
+            elo.init_form()
+            return n_matches
+
+        def elo_replay():
+            elo.initialize_team_ratings()
+            elo.process_season()
+            return n_matches
+
+        def h2h():
+            manager = DataManager(league_ids, db_path)
+            for home in teams:
+                for away in teams:
+                    manager.get_h2h_adjustment(home, away, elo.k_factor)
+            return len(teams) ** 2
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            simulator = Simulator(info["sim_league_id"])
+
+        def sim_scalar():
+            simulator.simulate_season_outcome_n_times(args.scalar_sims, seed=args.seed)
+            return args.scalar_sims
+
+        def sim_vectorized():
+            simulator.simulate_season_outcome_vectorized(args.vectorized_sims, seed=args.seed)
+            return args.vectorized_sims
+
+        benchmarks = [
+            ("get_fixtures", get_fixtures, "matches/s"),
+            ("init_form", init_form, "matches/s"),
+            ("elo_replay", elo_replay, "matches/s"),
+            ("h2h", h2h, "lookups/s"),
+            ("sim_scalar", sim_scalar, "sims/s"),
+            ("sim_vectorized", sim_vectorized, "sims/s"),
+        ]
+        results = {}
+        for name, fn, unit in benchmarks:
+            if args.only and name not in args.only:
+                continue
+            seconds, count, peak_mb = measure(fn, args.repeat, memory=not args.no_memory)
+            results[name] = {
+                "seconds": seconds,
+                "count": count,
+                "rate": count / seconds if seconds else float("inf"),
+                "unit": unit,
+                "peak_mb": peak_mb,
+            }
+
+        db.get_manager(db_path).close()
+        return results
+
+
+def compare(results, baseline, tolerance):
+    """Print rate ratios against a baseline. Returns the (size, benchmark) pairs that regressed."""
+    regressions = []
+    print(f"\n{'size':<10} {'benchmark':<16} {'baseline':>14} {'current':>14} {'ratio':>7}")
+    for size, benchmarks in results.items():
+        for name, result in benchmarks.items():
+            before = baseline.get("results", {}).get(size, {}).get(name)
+            if before is None:
+                continue
+            ratio = result["rate"] / before["rate"]
+            flag = ""
+            if ratio < 1 - tolerance:
+                flag = "  REGRESSION"
+                regressions.append((size, name))
+            print(f"{size:<10} {name:<16} {before['rate']:14,.1f} {result['rate']:14,.1f} {ratio:6.2f}x{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Elo, form, H2H and simulation hot paths.")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Comma separated teams x seasons, e.g. 16x1,200x30")
+    parser.add_argument("--only", nargs="*", help="Run only these benchmarks")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--scalar-sims", type=int, default=20)
+    parser.add_argument("--vectorized-sims", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc run")
+    parser.add_argument("--save", help="Write results to this JSON file")
+    parser.add_argument("--compare", help="Compare rates against this baseline JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown before flagging, as a fraction")
+    args = parser.parse_args()
+
+    results = {}
+    for size in args.sizes.split(","):
+        n_teams, n_seasons = parse_size(size)
+        results[size] = bench_size(n_teams, n_seasons, args)
+        for name, result in results[size].items():
+            memory = f"{result['peak_mb']:9.1f} MB" if result["peak_mb"] is not None else ""
+            print(f"{size:<10} {name:<16} {result['seconds']:8.3f} s {result['rate']:14,.1f} {result['unit']:<10} {memory}")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+                "platform": platform.platform(),
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "results": results,
+            }, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src import db
+from src.migration import migrate_schema
+
+"""
+Synthetic league generator for the benchmarks.
+
+Builds a football.db-shaped database with n_teams teams split into leagues of at most 16,
+each playing a double round robin for n_seasons seasons. The last season is half played:
+the played half goes into matches and table_standings, the rest into future_matches.
+League ids start at 103, so the first league is treated as Eliteserien by the model.
+"""
+
+LEAGUE_SIZE = 16
+FIRST_LEAGUE_ID = 103
+FIRST_SEASON = 2000
+
+
+def round_robin(teams):
+    """Double round robin as a list of rounds of (home, away) pairs (circle method)."""
+    teams = list(teams)
+    if len(teams) % 2:
+        teams.append(None)
+    n = len(teams)
+    rounds = []
+    for r in range(n - 1):
+        pairs = [(teams[i], teams[n - 1 - i]) for i in range(n // 2)]
+        rounds.append([(h, a) if r % 2 else (a, h) for h, a in pairs if h is not None and a is not None])
+        teams.insert(1, teams.pop())
+    return rounds + [[(a, h) for h, a in rnd] for rnd in rounds]
+
+
+def build_database(db_path, n_teams, n_seasons, seed=0):
+    """
+    Create and fill a database at db_path.
+
+    Returns:
+        Dict[str, Any]: league_ids, the simulated league id and the number of matches written.
+    """
+    rng = random.Random(seed)
+    migrate_schema(db_path)
+    conn = db.connect(db_path)
+
+    leagues = {}
+    for i in range(n_teams):
+        leagues.setdefault(FIRST_LEAGUE_ID + i // LEAGUE_SIZE, []).append(f"TEAM {i:03d}")
+    strength = {team: rng.gauss(0, 1) for teams in leagues.values() for team in teams}
+
+    matches, future, standings = [], [], []
+    for league_id, teams in leagues.items():
+        for s in range(n_seasons):
+            season = str(FIRST_SEASON + s)
+            start = date(FIRST_SEASON + s, 4, 1)
+            rounds = round_robin(teams)
+            last_season = s == n_seasons - 1
+            points = {team: 0 for team in teams}
+            for r, pairs in enumerate(rounds, start=1):
+                match_date = (start + timedelta(days=7 * r)).isoformat() + "T18:00:00+02:00"
+                for home, away in pairs:
+                    if last_season and r > len(rounds) // 2:
+                        future.append((league_id, season, str(r), match_date, home, away, 0.5, 0.3, 1500, 1500))
+                        continue
+                    diff = strength[home] - strength[away] + 0.3
+                    home_score = max(0, int(rng.gauss(1.4 + diff / 2, 1)))
+                    away_score = max(0, int(rng.gauss(1.1 - diff / 2, 1)))
+                    result = "Home" if home_score > away_score else "Away" if home_score < away_score else "Draw"
+                    matches.append((league_id, season, str(r), match_date, home, away, home_score, away_score, result))
+                    if last_season:
+                        points[home] += {"Home": 3, "Draw": 1, "Away": 0}[result]
+                        points[away] += {"Home": 0, "Draw": 1, "Away": 3}[result]
+            if last_season:
+                ranked = sorted(points.items(), key=lambda x: x[1], reverse=True)
+                standings += [(league_id, team, pos, pts) for pos, (team, pts) in enumerate(ranked, start=1)]
+
+    with conn:
+        conn.executemany(
+            "INSERT INTO teams (name, league_id, home_strength, away_strength, elo_rating) VALUES (?, ?, ?, ?, ?)",
+            [(team, league_id, 0.45, 0.3, 1500.0) for league_id, teams in leagues.items() for team in teams]
+        )
+        conn.executemany(
+            "INSERT INTO matches (league_id, season, round, date, home_team, away_team, home_score, away_score, result) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", matches
+        )
+        conn.executemany(
+            "INSERT INTO future_matches (league_id, season, round, date, home_team, away_team, home_strength, "
+            "away_strength, home_team_elo, away_team_elo) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", future
+        )
+        conn.executemany(
+            "INSERT INTO table_standings (league_id, team, position, points) VALUES (?, ?, ?, ?)", standings
+        )
+
+    return {
+        "league_ids": sorted(leagues),
+        "sim_league_id": FIRST_LEAGUE_ID,
+        "matches": len(matches),
+        "future_matches": len(future),
+    }
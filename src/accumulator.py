@@ -0,0 +1,102 @@
+import numpy as np
+from . import helper
+
+"""
+This module contains the RankAccumulator class, an online aggregate of simulation results.
+
+The simulation loops update it in place instead of keeping one team_points dict per run,
+so memory stays constant in the number of simulations. It holds:
+- Team x position counts.
+- Running mean and variance of points (Welford, with Chan's merge for batches).
+- Optionally, a per-team histogram of final points, from which exact quantiles are read.
+  Points are small integers, so this costs O(teams x max points) regardless of N.
+"""
+
+class RankAccumulator:
+    def __init__(self, teams, track_quantiles=False):
+        self.teams = list(teams)
+        n_teams = len(self.teams)
+
+        self.n = 0
+        self.position_counts = np.zeros((n_teams, n_teams), dtype=np.int64)
+        self.mean = np.zeros(n_teams)
+        self.m2 = np.zeros(n_teams)
+        self.points_histogram = np.zeros((n_teams, 0), dtype=np.int64) if track_quantiles else None
+
+    def update(self, team_points):
+        """Add a single simulation, given as a {team: points} dict."""
+        self.update_batch(np.array([[team_points[team] for team in self.teams]]))
+
+    def update_batch(self, points):
+        """Add a batch of simulations, given as an array of shape (B, teams) in team order."""
+        batch_size, n_teams = points.shape
+        if batch_size == 0:
+            return
+
+        # Ties keep team order, like the stable sort in helper.analyze_simulations
+        order = np.argsort(-points, axis=1, kind='stable')
+        flat = (order * n_teams + np.arange(n_teams)).ravel()
+        self.position_counts += np.bincount(flat, minlength=n_teams * n_teams).reshape(n_teams, n_teams)
+
+        batch_mean = points.mean(axis=0)
+        batch_m2 = ((points - batch_mean) ** 2).sum(axis=0)
+        self._merge_moments(batch_size, batch_mean, batch_m2)
+
+        if self.points_histogram is not None:
+            if points.min() < 0:
+                raise ValueError("Quantile tracking requires non-negative points.")
+            width = int(points.max()) + 1
+            flat = (np.arange(n_teams) * width + points).ravel()
+            self._add_histogram(np.bincount(flat, minlength=n_teams * width).reshape(n_teams, width))
+
+    def merge(self, other):
+        """Fold another accumulator over the same teams into this one."""
+        if other.n == 0:
+            return
+        self.position_counts += other.position_counts
+        self._merge_moments(other.n, other.mean, other.m2)
+        if self.points_histogram is not None and other.points_histogram is not None:
+            self._add_histogram(other.points_histogram)
+
+    def _merge_moments(self, count, mean, m2):
+        total = self.n + count
+        delta = mean - self.mean
+        self.mean = self.mean + delta * count / total
+        self.m2 = self.m2 + m2 + delta ** 2 * self.n * count / total
+        self.n = total
+
+    def _add_histogram(self, histogram):
+        width = max(self.points_histogram.shape[1], histogram.shape[1])
+        if self.points_histogram.shape[1] < width:
+            self.points_histogram = np.pad(self.points_histogram, ((0, 0), (0, width - self.points_histogram.shape[1])))
+        self.points_histogram[:, :histogram.shape[1]] += histogram
+
+    def quantile(self, q):
+        """Points quantile per team as a {team: points} dict."""
+        if self.points_histogram is None:
+            raise ValueError("Accumulator was created without track_quantiles=True.")
+        cumulative = np.cumsum(self.points_histogram, axis=1)
+        target = np.maximum(np.ceil(q * self.n), 1)
+        return {
+            team: int(np.searchsorted(cumulative[i], target))
+            for i, team in enumerate(self.teams)
+        }
+
+    def snapshot(self, quantiles=(0.05, 0.5, 0.95)):
+        """
+        Plain-dict view of the current state, for print_rank_probability_distribution and the Flask views.
+
+        Returns:
+            Dict[str, Any]: simulations, rank_probabilities (same format as helper.analyze_simulations),
+            mean_points, std_points and, if tracked, quantiles keyed by q.
+        """
+        variance = self.m2 / (self.n - 1) if self.n > 1 else np.zeros_like(self.m2)
+        snapshot = {
+            'simulations': self.n,
+            'rank_probabilities': helper.analyze_rank_counts(self.teams, self.position_counts, self.n) if self.n else {},
+            'mean_points': {team: float(m) for team, m in zip(self.teams, self.mean)},
+            'std_points': {team: float(s) for team, s in zip(self.teams, np.sqrt(variance))},
+        }
+        if self.points_histogram is not None and self.n:
+            snapshot['quantiles'] = {q: self.quantile(q) for q in quantiles}
+        return snapshot
@@ -0,0 +1,123 @@
+from collections import defaultdict
+import numpy as np
+
+"""
+This module contains the analytic season outcome estimator behind Simulator.simulate_season_outcome_analytic.
+
+The match probabilities the simulator draws from come from the model's fitted ratings and do
+not change during a simulated season, so every match is an independent three-way draw. Each
+team's final points distribution is therefore exact: the current table points convolved with
+one {0, 1, 3} step per remaining match. Expected points and points spread are exact.
+
+Final positions depend on the joint distribution. They are estimated by treating team totals
+as independent. For each possible total, the number of teams finishing above is a
+Poisson-binomial variable. Ties are broken by team order, as in the Monte Carlo paths. The
+shared matches between teams are what this ignores; compare_with_monte_carlo measures it.
+"""
+
+
+def outcome_probabilities(schedule):
+    """
+    (home, draw, away) probability per match, as the Monte Carlo draw sees them:
+    home if u < p_home, draw if u < p_home + p_draw, otherwise away, for u uniform on [0, 1).
+    """
+    p_home = np.clip(schedule.p_home, 0, 1)
+    p_home_or_draw = np.clip(schedule.p_home_or_draw, p_home, 1)
+    return p_home, p_home_or_draw - p_home, 1 - p_home_or_draw
+
+
+def points_distributions(schedule):
+    """Exact final points distribution per team id, shape (T, max points + 1)."""
+    start_points = schedule.start_points
+    n_teams = len(start_points)
+    games = np.bincount(schedule.home_idx, minlength=n_teams) + np.bincount(schedule.away_idx, minlength=n_teams)
+    width = int((start_points + 3 * games).max()) + 1
+
+    pmf = np.zeros((n_teams, width))
+    pmf[np.arange(n_teams), start_points] = 1.0
+
+    p_home, p_draw, p_away = outcome_probabilities(schedule)
+    for h, a, win, draw, loss in zip(schedule.home_idx.tolist(), schedule.away_idx.tolist(),
+                                     p_home.tolist(), p_draw.tolist(), p_away.tolist()):
+        for team, p_win, p_loss in ((h, win, loss), (a, loss, win)):
+            current = pmf[team].copy()
+            pmf[team] *= p_loss
+            pmf[team, 1:] += current[:-1] * draw
+            pmf[team, 3:] += current[:-3] * p_win
+
+    return pmf
+
+
+def rank_distributions(pmf):
+    """
+    Position probabilities, shape (T, T), assuming independent team totals.
+    rank[i, r] is the probability that team i finishes in position r + 1.
+    """
+    n_teams = pmf.shape[0]
+    cdf = np.cumsum(pmf, axis=1)
+    above_strict = 1 - cdf # P(X_j > x)
+    rank = np.zeros((n_teams, n_teams))
+
+    for i in range(n_teams):
+        support = np.nonzero(pmf[i] > 1e-15)[0]
+        weights = pmf[i, support]
+
+        # dp[x, k]: probability that k of the other teams finish above team i, given team i has x points
+        dp = np.zeros((len(support), n_teams))
+        dp[:, 0] = 1.0
+        for j in range(n_teams):
+            if j == i:
+                continue
+            above = above_strict[j, support]
+            if j < i:
+                above = above + pmf[j, support] # Ties rank the earlier team first
+            below = 1 - above
+            dp[:, 1:] = dp[:, 1:] * below[:, None] + dp[:, :-1] * above[:, None]
+            dp[:, 0] *= below
+
+        rank[i] = weights @ dp
+
+    return rank
+
+
+def summarize(teams, pmf, rank):
+    """Snapshot in the same format as RankAccumulator.snapshot, with exact points moments."""
+    points = np.arange(pmf.shape[1])
+    mean = pmf @ points
+    variance = np.maximum(pmf @ points ** 2 - mean ** 2, 0)
+
+    rank_probabilities = defaultdict(dict)
+    for team, positions in zip(teams, rank):
+        for position, probability in enumerate(positions, start=1):
+            if probability > 0:
+                rank_probabilities[team][position] = probability * 100
+        for position in range(1, 17):
+            rank_probabilities[team].setdefault(position, 0.0)
+
+    return {
+        'simulations': None,
+        'rank_probabilities': rank_probabilities,
+        'mean_points': {team: float(m) for team, m in zip(teams, mean)},
+        'std_points': {team: float(s) for team, s in zip(teams, np.sqrt(variance))},
+    }
+
+
+def drift(analytic, monte_carlo):
+    """
+    How far an analytic snapshot is from a Monte Carlo snapshot over the same teams.
+    Probabilities are in percentage points.
+    """
+    teams = list(analytic['mean_points'])
+    last = len(teams)
+
+    def position_gap(position):
+        return float(max(abs(analytic['rank_probabilities'][team].get(position, 0.0)
+                             - monte_carlo['rank_probabilities'][team].get(position, 0.0)) for team in teams))
+
+    return {
+        'max_mean_points_diff': max(abs(analytic['mean_points'][team] - monte_carlo['mean_points'][team]) for team in teams),
+        'max_std_points_diff': max(abs(analytic['std_points'][team] - monte_carlo['std_points'][team]) for team in teams),
+        'max_top_probability_diff': position_gap(1),
+        'max_bottom_probability_diff': position_gap(last),
+        'max_rank_probability_diff': max(position_gap(position) for position in range(1, last + 1)),
+    }
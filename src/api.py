@@ -1,4 +1,13 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Tuple
 import requests
+from requests.adapters import HTTPAdapter
 import re
 from . import helper
 from .migration import migrate_fixtures_to_sqlite, migrate_future_to_sqlite
@@ -7,6 +16,11 @@ from .config import API_TOKEN
 
 NORWAY_LEAGUES = [103, 104]
 
+API_URL = "https://v3.football.api-sports.io/fixtures"
+CACHE_DIR = os.environ.get("FOOTBALL_API_CACHE", ".api_cache")
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_WORKERS = 16 # Enough for every (league, season) pair the app fetches at once
+
 
 def clean_round_label(round_str: str) -> str | None:
     """
@@ -19,25 +33,164 @@ def clean_round_label(round_str: str) -> str | None:
     return match.group(1) if match else round_str
 
 
-def get_previous_matches(seasons: list, country_league_ids: list = NORWAY_LEAGUES):
+class RateLimiter:
+    """Spaces request starts at least 1 / requests_per_second apart, across threads."""
+
+    def __init__(self, requests_per_second: float):
+        self.interval = 1 / requests_per_second if requests_per_second else 0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+class FixtureFetcher:
+    """
+    Fetches fixtures for many (league, season) pairs concurrently.
+
+    Features:
+    - One pooled requests.Session, with headers built once.
+    - A thread pool sized to the number of pairs (up to max_workers), so all pairs are in flight
+      at once under a requests-per-second limit.
+    - Exponential backoff on 429 and 5xx, honouring Retry-After.
+    - An on-disk cache per (league, season). Responses with an ETag or Last-Modified are
+      revalidated with a conditional request. Responses without either are reused for
+      the rest of the day they were fetched.
+
+    api_url can point at a local stand-in server for testing.
+    """
+
+    def __init__(self, api_url: str = API_URL, api_token: str = API_TOKEN, max_workers: int = MAX_WORKERS,
+                 requests_per_second: float = 10, max_retries: int = 4, backoff: float = 0.5,
+                 timeout: float = 10, cache_dir: Optional[str] = CACHE_DIR):
+        self.api_url = api_url
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.cache_dir = cache_dir
+        self.rate_limiter = RateLimiter(requests_per_second)
+
+        self.session = requests.Session()
+        self.session.headers.update({
+            "x-rapidapi-host": "v3.football.api-sports.io",
+            "x-rapidapi-key": api_token
+        })
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _cache_path(self, league_id: int, season) -> Optional[str]:
+        if not self.cache_dir:
+            return None
+        return os.path.join(self.cache_dir, f"fixtures_{league_id}_{season}.json")
+
+    def _read_cache(self, league_id: int, season) -> Optional[dict]:
+        path = self._cache_path(league_id, season)
+        if path and os.path.exists(path):
+            with open(path) as f:
+                return json.load(f)
+        return None
+
+    def _write_cache(self, league_id: int, season, response: requests.Response, data: dict) -> None:
+        path = self._cache_path(league_id, season)
+        if not path:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entry = {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "fetched": date.today().isoformat(),
+            "data": data
+        }
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+
+    def _retry_delay(self, response: requests.Response, attempt: int) -> float:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                try:
+                    return max(parsedate_to_datetime(retry_after).timestamp() - time.time(), 0)
+                except (TypeError, ValueError):
+                    pass
+        return self.backoff * 2 ** attempt
+
+    def fetch(self, league_id: int, season) -> Optional[dict]:
+        """
+        Fetch the API response for one league and season.
+
+        Returns:
+            Optional[dict]: The decoded JSON body, or None if the request failed.
+        """
+        cached = self._read_cache(league_id, season)
+        headers = {}
+        if cached:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+            if not headers and cached.get("fetched") == date.today().isoformat():
+                return cached["data"]
+
+        params = {
+            "league": league_id,
+            "season": season,
+            "timezone": "Europe/Oslo",
+        }
+
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.wait()
+            try:
+                response = self.session.get(self.api_url, params=params, headers=headers, timeout=self.timeout)
+            except requests.RequestException as e:
+                if attempt == self.max_retries:
+                    print(f"Failed to fetch data for season {season} (league {league_id}): {e}")
+                    return None
+                time.sleep(self.backoff * 2 ** attempt)
+                continue
+
+            if response.status_code == 304 and cached:
+                return cached["data"]
+            if response.status_code == 200:
+                data = response.json()
+                self._write_cache(league_id, season, response, data)
+                return data
+            if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                time.sleep(self._retry_delay(response, attempt))
+                continue
+
+            print(f"Failed to fetch data for season {season} (league {league_id}): {response.status_code}")
+            return None
+
+    def fetch_all(self, league_ids, seasons) -> Dict[Tuple[int, int], Optional[dict]]:
+        """Fetch every (league, season) pair concurrently."""
+        pairs = [(league_id, season) for league_id in league_ids for season in seasons]
+        with ThreadPoolExecutor(max_workers=max(min(self.max_workers, len(pairs)), 1)) as pool:
+            results = pool.map(lambda pair: self.fetch(*pair), pairs)
+            return dict(zip(pairs, results))
+
+
+def get_previous_matches(seasons: list, country_league_ids: list = NORWAY_LEAGUES, fetcher: Optional[FixtureFetcher] = None):
+    fetcher = fetcher or FixtureFetcher()
+    responses = fetcher.fetch_all(country_league_ids, seasons)
+
     for league_id in country_league_ids:
         season_matches = {}
 
         for season in seasons:
-            api_url = "https://v3.football.api-sports.io/fixtures"
-            headers = {
-                "x-rapidapi-host": "v3.football.api-sports.io",
-                "x-rapidapi-key": API_TOKEN
-            }
-            query_fixtures = {
-                "league": league_id,
-                "season": season,
-                "timezone": "Europe/Oslo",
-            }
-
-            response = requests.get(api_url, headers=headers, params=query_fixtures)
-            if response.status_code == 200:
-                data = response.json()
+            data = responses[(league_id, season)]
+            if data is not None:
                 round_matches = {}
                 for fixture in data['response']:
                     raw_round = fixture['league']['round']
@@ -69,35 +222,24 @@ def get_previous_matches(seasons: list, country_league_ids: list = NORWAY_LEAGUE
                     round_matches.setdefault(gw, []).append(match_info)
 
                 season_matches[season] = round_matches
-            else:
-                print(f"Failed to fetch data for season {season} (league {league_id}): {response.status_code}")
 
         migrate_fixtures_to_sqlite(league_id, season_matches)
 
 
-def get_future_matches(seasons: list, country_league_ids: list = NORWAY_LEAGUES):
+def get_future_matches(seasons: list, country_league_ids: list = NORWAY_LEAGUES, fetcher: Optional[FixtureFetcher] = None):
     dm = data_manager.DataManager(country_league_ids)
     home_strength = dm.get_team_strengths()
     away_strength = home_strength
     elo = dm.get_team_elos()
 
+    fetcher = fetcher or FixtureFetcher()
+    responses = fetcher.fetch_all(country_league_ids, seasons)
+
     for league_id in country_league_ids:
         season_matches = {}
         for season in seasons:
-            api_url = "https://v3.football.api-sports.io/fixtures"
-            headers = {
-                "x-rapidapi-host": "v3.football.api-sports.io",
-                "x-rapidapi-key": API_TOKEN
-            }
-            query_fixtures = {
-                "league": league_id,
-                "season": season,
-                "timezone": "Europe/Oslo",
-            }
-
-            response = requests.get(api_url, headers=headers, params=query_fixtures)
-            if response.status_code == 200:
-                data = response.json()
+            data = responses[(league_id, season)]
+            if data is not None:
                 round_matches = {}
                 for fixture in data['response']:
                     raw_round = fixture['league']['round']
@@ -127,7 +269,5 @@ def get_future_matches(seasons: list, country_league_ids: list = NORWAY_LEAGUES)
                     round_matches.setdefault(gw, []).append(match_info)
 
                 season_matches[season] = round_matches
-            else:
-                print(f"Failed to fetch future data for season {season} (league {league_id}): {response.status_code}")
 
         migrate_future_to_sqlite(league_id, season_matches)
@@ -0,0 +1,233 @@
+import argparse
+import itertools
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from .data_manager import DataManager
+
+"""
+This module contains a walk-forward backtest of the Elo model and a parallel grid search over its parameters.
+
+The historical matches are replayed in order. Before each match the model predicts home/draw/away
+probabilities from what it knew at that point, and the prediction is scored against the result;
+then the result updates the ratings, gains and head-to-head record. The prediction and update
+rules are those of EloRatingSystem.calculate_match_probabilities and process_result, with the
+hard-coded constants exposed as parameters:
+
+- k_factor, league_weights, league_initial_ratings, initial_rating: as in EloRatingSystem
+- form_weights: weights of the last three gains, oldest first, for the form term of the
+  prediction. (1, 1, 1) is the plain mean that calculate_match_probabilities uses.
+- h2h_factor: as in DataManager.get_h2h_adjustment, from meetings before the match only
+
+The model's three probabilities do not sum to one, so they are clipped and normalized before
+scoring. A team starts from the initial rating of the league of its first match, so nothing
+from later seasons leaks into early predictions.
+
+The fixture arrays are built once and sent to each worker process once, through the pool
+initializer; each configuration is then a pure Python replay over plain lists.
+
+Usage:
+    python -m src.backtest --leagues 103 104 --k-factor 1 2 3 4 --h2h-factor 0 4 8
+"""
+
+DEFAULT_PARAMETERS = {
+    'k_factor': 3,
+    'initial_rating': 1500,
+    'league_initial_ratings': {103: 1500, 104: 1300, 105: 1250},
+    'league_weights': {103: 1.0, 104: 0.75},
+    'form_weights': (1, 1, 1),
+    'h2h_factor': 8,
+}
+
+EPSILON = 1e-6
+
+_worker_fixtures = None
+
+
+def prepare_fixtures(league_ids, db_path=None):
+    """
+    Plain-list fixture columns for the replay, from one FixtureStore load.
+    Everything that does not depend on the parameters (home advantage, log ages, first league) is computed here.
+    """
+    manager = DataManager(league_ids, db_path)
+    store = manager.get_fixture_store()
+    strengths = manager.get_team_strengths()
+
+    home_strength = [strengths.get(team, {}).get('home', 1) * 100 for team in store.teams]
+    away_strength = [strengths.get(team, {}).get('away', 1) * 100 for team in store.teams]
+    home, away = store.home.tolist(), store.away.tolist()
+    league = store.league_id.tolist()
+
+    first_league = [None] * len(store.teams)
+    for h, a, league_id in zip(home, away, league):
+        for team in (h, a):
+            if first_league[team] is None:
+                first_league[team] = league_id
+
+    # Rows are grouped by season, so the first season is a prefix
+    seasons = store.season.tolist()
+    burn_in = seasons.count(seasons[0]) if len(set(seasons)) > 1 else 0
+
+    return {
+        'n_teams': len(store.teams),
+        'home': home,
+        'away': away,
+        'home_score': store.home_score.tolist(),
+        'away_score': store.away_score.tolist(),
+        'league_id': league,
+        'log_age': store.log_ages(True).tolist(),
+        'advantage': [home_strength[h] + (home_strength[h] - away_strength[a]) / 2 for h, a in zip(home, away)],
+        'first_league': first_league,
+        'burn_in': burn_in, # Matches of the first season only warm the model up
+    }
+
+
+def _form(gains, weights):
+    if not gains:
+        return 0.5
+    weights = weights[-len(gains):]
+    return sum(g * w for g, w in zip(gains, weights)) / sum(weights)
+
+
+def walk_forward(fixtures, parameters):
+    """
+    Replay the fixtures with one parameter set.
+
+    Returns:
+        Dict[str, float]: Mean log-loss and mean Brier score over the scored matches, and their count.
+    """
+    k_factor = parameters['k_factor']
+    league_weights = parameters['league_weights']
+    form_weights = tuple(parameters['form_weights'])
+    h2h_factor = parameters['h2h_factor']
+    ratings = [
+        parameters['league_initial_ratings'].get(league_id, parameters['initial_rating'])
+        for league_id in fixtures['first_league']
+    ]
+    gains = [[] for _ in range(fixtures['n_teams'])]
+    h2h = {}
+    burn_in = fixtures['burn_in']
+
+    log_loss = brier = 0.0
+    scored = 0
+    for j, (h, a, home_score, away_score, league_id, log_age, advantage) in enumerate(zip(
+            fixtures['home'], fixtures['away'], fixtures['home_score'], fixtures['away_score'],
+            fixtures['league_id'], fixtures['log_age'], fixtures['advantage'])):
+        pair = (h, a) if h <= a else (a, h)
+        h2h_score, h2h_games = h2h.get(pair, (0.0, 0))
+        rating_home, rating_away = ratings[h], ratings[a]
+
+        # Outcome: 0 home win, 1 draw, 2 away win
+        if home_score > away_score:
+            outcome, actual_home = 0, 1
+        elif home_score < away_score:
+            outcome, actual_home = 2, 0
+        else:
+            outcome, actual_home = 1, 0.5
+
+        if j >= burn_in:
+            adjustment = 0
+            if h2h_games:
+                adjustment = (h2h_score if pair[0] == h else -h2h_score) * k_factor / h2h_games * h2h_factor
+            base = 1 / (1 + 10 ** ((rating_away - (rating_home + adjustment) + advantage) / 400))
+            adjusted = base * 0.7 + _form(gains[h], form_weights) * 0.15 + (1 - _form(gains[a], form_weights)) * 0.15
+            p = (
+                min(max(adjusted, EPSILON), 1),
+                min(max(1 - abs(0.5 - adjusted), EPSILON), 1),
+                min(max(1 - adjusted, EPSILON), 1),
+            )
+            total = p[0] + p[1] + p[2]
+            log_loss -= math.log(p[outcome] / total)
+            brier += sum((p[i] / total - (i == outcome)) ** 2 for i in range(3))
+            scored += 1
+
+        adjusted_k = k_factor * league_weights.get(league_id, 1.0)
+        expected_home = 1 / (1 + 10 ** ((rating_away - rating_home + advantage) / 400))
+        change = adjusted_k * (adjusted_k / log_age) * (actual_home - expected_home)
+        ratings[h] = rating_home + change
+        ratings[a] = rating_away - change
+        gains[h] = (gains[h] + [change])[-3:]
+        gains[a] = (gains[a] + [-change])[-3:]
+
+        result = 1 if actual_home == 1 else -1 if actual_home == 0 else 0
+        h2h[pair] = (h2h_score + (result if pair[0] == h else -result) / log_age, h2h_games + 1)
+
+    return {
+        'log_loss': log_loss / scored if scored else float('nan'),
+        'brier': brier / scored if scored else float('nan'),
+        'matches': scored,
+    }
+
+
+def parameter_grid(**values):
+    """
+    Every combination of the given parameter values, on top of DEFAULT_PARAMETERS.
+    Each keyword takes a list, e.g. parameter_grid(k_factor=[2, 3], h2h_factor=[0, 8]).
+    """
+    names = list(values)
+    return [
+        {**DEFAULT_PARAMETERS, **dict(zip(names, combination))}
+        for combination in itertools.product(*(values[name] for name in names))
+    ]
+
+
+def _init_worker(fixtures):
+    global _worker_fixtures
+    _worker_fixtures = fixtures
+
+
+def _run(parameters):
+    return {**parameters, **walk_forward(_worker_fixtures, parameters)}
+
+
+def grid_search(fixtures, grid, workers=None, chunksize=None):
+    """
+    Score every parameter set in grid across a process pool.
+
+    Returns:
+        List[Dict]: One entry per parameter set (the parameters plus log_loss, brier and matches),
+        best log-loss first.
+    """
+    workers = workers or os.cpu_count() or 1
+    chunksize = chunksize or max(1, len(grid) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(fixtures,)) as pool:
+        results = list(pool.map(_run, grid, chunksize=chunksize))
+    return sorted(results, key=lambda result: result['log_loss'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Walk-forward backtest and grid search of the Elo model.")
+    parser.add_argument("--leagues", type=int, nargs="+", default=[103, 104])
+    parser.add_argument("--k-factor", type=float, nargs="+", default=[DEFAULT_PARAMETERS['k_factor']])
+    parser.add_argument("--h2h-factor", type=float, nargs="+", default=[DEFAULT_PARAMETERS['h2h_factor']])
+    parser.add_argument("--second-tier-weight", type=float, nargs="+",
+                        default=[DEFAULT_PARAMETERS['league_weights'][104]], help="league_weights[104]")
+    parser.add_argument("--second-tier-rating", type=float, nargs="+",
+                        default=[DEFAULT_PARAMETERS['league_initial_ratings'][104]], help="league_initial_ratings[104]")
+    parser.add_argument("--form-weights", type=json.loads, nargs="+", default=[list(DEFAULT_PARAMETERS['form_weights'])],
+                        help="JSON lists of three weights, oldest first, e.g. '[1, 2, 3]'")
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    grid = parameter_grid(
+        k_factor=args.k_factor,
+        h2h_factor=args.h2h_factor,
+        league_weights=[{**DEFAULT_PARAMETERS['league_weights'], 104: w} for w in args.second_tier_weight],
+        league_initial_ratings=[{**DEFAULT_PARAMETERS['league_initial_ratings'], 104: r} for r in args.second_tier_rating],
+        form_weights=[tuple(w) for w in args.form_weights],
+    )
+    fixtures = prepare_fixtures(args.leagues)
+    results = grid_search(fixtures, grid, args.workers)
+
+    print(f"{len(grid)} configurations, {results[0]['matches'] if results else 0} scored matches each")
+    for result in results[:args.top]:
+        print(f"log-loss {result['log_loss']:.4f}  brier {result['brier']:.4f}  "
+              f"k={result['k_factor']:g} h2h={result['h2h_factor']:g} "
+              f"w104={result['league_weights'][104]:g} r104={result['league_initial_ratings'][104]:g} "
+              f"form={list(result['form_weights'])}")
+
+
+if __name__ == "__main__":
+    main()
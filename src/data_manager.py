@@ -1,16 +1,37 @@
-from typing import Any, Dict, List
+import hashlib
+import json
+from datetime import date
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+import numpy as np
+from . import db
 from . import helper
-import sqlite3
+from . import metrics
+from . import migration
+from . import records
+from .fixture_store import FixtureStore
+from .records import FutureMatch, Match
+
+DEFAULT_ARRAYSIZE = 1000 # Rows per fetchmany() in the iter_* readers
+
+# The order get_fixtures() is walked in: seasons, then rounds, by first match date; date order within a round
+REPLAY_ORDER = (
+    "MIN(date) OVER (PARTITION BY season), season, "
+    "MIN(date) OVER (PARTITION BY season, round), round, date"
+)
 
 class DataManager:
-    def __init__(self, league_ids: List[int], db_path: str = 'football.db'):
+    def __init__(self, league_ids: Union[int, List[int]], db_path: Optional[str] = None):
         self.db_path = db_path
-        self.league_ids = league_ids
-        
+        self.league_ids = [league_ids] if isinstance(league_ids, int) else list(league_ids)
+        self._h2h_index = None
+        self._h2h_index_date = None
+        migration.register_fixtures_listener(self.invalidate_h2h_index)
+
 
     def _connect(self):
-        return sqlite3.connect(self.db_path)
+        return db.connect(self.db_path)
     
+    @metrics.timed("db_query", query="get_team_elos")
     def get_team_elos(self) -> Dict[str, float]:
         """
         Fetch the ELO ratings for all teams across the specified league IDs.
@@ -23,6 +44,7 @@ class DataManager:
             cur = conn.execute(query, self.league_ids)
             return {row[0]: row[1] for row in cur.fetchall()}
       
+    @metrics.timed("db_query", query="get_team_strengths")
     def get_team_strengths(self) -> Dict[str, Dict[str, float]]:
         """
         Fetch home and away strength values for all teams in the specified leagues.
@@ -44,7 +66,8 @@ class DataManager:
             }
 
 
-    def get_future_matches(self) -> Dict[str, Dict[str, List[Dict]]]:
+    @metrics.timed("db_query", query="get_future_matches")
+    def get_future_matches(self) -> Dict[str, Dict[str, List[FutureMatch]]]:
         """
         Fetch future matches across multiple leagues, grouped by season and round.
         Each match includes its league_id.
@@ -66,19 +89,11 @@ class DataManager:
                 rnd = row[0]
                 if rnd not in future["2025"]:
                     future["2025"][rnd] = []
-                future["2025"][rnd].append({
-                    "date": row[1],
-                    "home_team": row[2],
-                    "away_team": row[3],
-                    "home_strength": row[4],
-                    "away_strength": row[5],
-                    "home_team_elo": row[6],
-                    "away_team_elo": row[7],
-                    "league_id": row[8]
-                })
+                future["2025"][rnd].append(records.future_match_from_row("2025", *row))
         return future
 
-    def get_fixtures(self) -> Dict[str, Dict[str, List[Dict]]]:
+    @metrics.timed("db_query", query="get_fixtures")
+    def get_fixtures(self) -> Dict[str, Dict[str, List[Match]]]:
         """
         Fetch historical fixtures from multiple leagues, grouped by season and round.
         Each match includes its league_id.
@@ -101,17 +116,102 @@ class DataManager:
                     fixtures[season] = {}
                 if rnd not in fixtures[season]:
                     fixtures[season][rnd] = []
-                fixtures[season][rnd].append({
-                    "date": row[2],
-                    "home_team": row[3],
-                    "away_team": row[4],
-                    "score": {"home": row[5], "away": row[6]},
-                    "result": row[7],
-                    "league_id": row[8]
-                })
+                fixtures[season][rnd].append(records.match_from_row(*row))
         return fixtures
 
-    def get_games_between_teams(self, team1: str, team2: str) -> List[Dict[str, Any]]:
+    def _iter_rows(self, query: str, params: List[Any], arraysize: int) -> Iterator[tuple]:
+        """Yield rows from the cursor, arraysize at a time, without materializing the result."""
+        cur = self._connect().execute(query, params)
+        cur.arraysize = arraysize
+        while True:
+            rows = cur.fetchmany()
+            if not rows:
+                return
+            yield from rows
+
+    def iter_fixtures(self, arraysize: int = DEFAULT_ARRAYSIZE, by_round: bool = False) -> Iterator[Match]:
+        """
+        Yield the historical matches of get_fixtures() one at a time, straight from the cursor.
+
+        Parameters:
+            arraysize (int): Rows fetched from SQLite per batch.
+            by_round (bool): Yield in the order get_fixtures() is walked (seasons, then rounds, by first
+                             match date; date order within a round) instead of plain date order.
+
+        Yields:
+            Match: A get_fixtures() match record.
+        """
+        placeholders = ','.join(['?'] * len(self.league_ids))
+        order = REPLAY_ORDER if by_round else "date"
+        query = f"""
+            SELECT season, round, date, home_team, away_team,
+                home_score, away_score, result, league_id
+            FROM matches
+            WHERE league_id IN ({placeholders})
+            ORDER BY {order}
+        """
+        for row in self._iter_rows(query, self.league_ids, arraysize):
+            yield records.match_from_row(*row)
+
+    def iter_future_matches(self, arraysize: int = DEFAULT_ARRAYSIZE) -> Iterator[FutureMatch]:
+        """Yield the matches of get_future_matches() in date order."""
+        placeholders = ','.join(['?'] * len(self.league_ids))
+        query = f"""
+            SELECT round, date, home_team, away_team,
+                home_strength, away_strength, home_team_elo, away_team_elo, league_id
+            FROM future_matches
+            WHERE league_id IN ({placeholders})
+            ORDER BY date ASC
+        """
+        for row in self._iter_rows(query, self.league_ids, arraysize):
+            yield records.future_match_from_row("2025", *row)
+
+    def get_rounds_per_season(self) -> Dict[str, int]:
+        """{season: number of distinct rounds}, as counted from get_fixtures() without loading it."""
+        placeholders = ','.join(['?'] * len(self.league_ids))
+        query = f"""
+            SELECT season, COUNT(DISTINCT round)
+            FROM matches
+            WHERE league_id IN ({placeholders})
+            GROUP BY season
+            ORDER BY MIN(date)
+        """
+        return {season: n_rounds for season, n_rounds in self._connect().execute(query, self.league_ids)}
+
+    @metrics.timed("db_query", query="get_fixture_store")
+    def get_fixture_store(self) -> FixtureStore:
+        """
+        Fetch the same matches as get_fixtures(), as a columnar FixtureStore.
+        Rows go straight from the cursor into arrays, no per-match dicts are built.
+        """
+        placeholders = ','.join(['?'] * len(self.league_ids))
+        query = f"""
+            SELECT season, round, date, home_team, away_team, home_score, away_score, league_id
+            FROM matches
+            WHERE league_id IN ({placeholders})
+            ORDER BY date ASC
+        """
+        with self._connect() as conn:
+            return FixtureStore.from_rows(conn.execute(query, self.league_ids))
+
+    @metrics.timed("db_query", query="get_future_store")
+    def get_future_store(self) -> FixtureStore:
+        """
+        Fetch the same matches as get_future_matches(), as a columnar FixtureStore without scores.
+        The season is hardcoded as '2025', as in get_future_matches().
+        """
+        placeholders = ','.join(['?'] * len(self.league_ids))
+        query = f"""
+            SELECT '2025', round, date, home_team, away_team, league_id
+            FROM future_matches
+            WHERE league_id IN ({placeholders})
+            ORDER BY date ASC
+        """
+        with self._connect() as conn:
+            return FixtureStore.from_rows(conn.execute(query, self.league_ids), with_scores=False)
+
+    @metrics.timed("db_query", query="get_games_between_teams")
+    def get_games_between_teams(self, team1: str, team2: str) -> List[Match]:
         """
         Get all matches between two teams across all configured leagues.
 
@@ -120,7 +220,7 @@ class DataManager:
             team2 (str): Name of the second team.
 
         Returns:
-            List[Dict[str, Any]]: A list of match dictionaries between the two teams.
+            List[Match]: The matches between the two teams, most recent first.
         """
         placeholders = ','.join(['?'] * len(self.league_ids))
         query = f"""
@@ -137,20 +237,52 @@ class DataManager:
 
         with self._connect() as conn:
             cur = conn.execute(query, params)
-            return [
-                {
-                    "season": row[0],
-                    "round": row[1],
-                    "date": row[2],
-                    "home_team": row[3],
-                    "away_team": row[4],
-                    "score": {"home": row[5], "away": row[6]},
-                    "result": row[7],
-                    "league_id": row[8]
-                }
-                for row in cur.fetchall()
-            ]
+            return [records.match_from_row(*row) for row in cur.fetchall()]
+
+    def iter_games_between_teams(self, team1: str, team2: str, arraysize: int = DEFAULT_ARRAYSIZE) -> Iterator[Match]:
+        """Yield the matches of get_games_between_teams() one at a time, most recent first."""
+        placeholders = ','.join(['?'] * len(self.league_ids))
+        query = f"""
+            SELECT season, round, date, home_team, away_team, home_score, away_score, result, league_id
+            FROM matches
+            WHERE league_id IN ({placeholders})
+            AND (
+                (home_team = ? AND away_team = ?) OR
+                (home_team = ? AND away_team = ?)
+            )
+            ORDER BY date DESC
+        """
+        params = self.league_ids + [team1, team2, team2, team1]
+        for row in self._iter_rows(query, params, arraysize):
+            yield records.match_from_row(*row)
+
+    @metrics.timed("db_query", query="build_h2h_index")
+    def build_h2h_index(self) -> Dict[Tuple[str, str], Tuple[float, int]]:
+        """
+        Build an in-memory head-to-head index, streaming the matches of get_fixtures().
 
+        Keys are team pairs sorted by name. Values hold the decayed score from the first
+        team's point of view and the number of games. The score is decayed with a k-factor
+        of 1, since get_decay_factor is linear in k.
+        """
+        index = {}
+        for match in self.iter_fixtures(by_round=True):
+            pair = tuple(sorted((match.home_team, match.away_team)))
+            result = helper.get_match_result(match, pair[0])  # +1 win, 0 draw, -1 loss
+            decay = helper.get_decay_factor(1, match.date)
+            score, games = index.get(pair, (0.0, 0))
+            index[pair] = (score + result * decay, games + 1)
+        return index
+
+    def invalidate_h2h_index(self, league_id: int = None) -> None:
+        """
+        Drop the cached head-to-head index so the next lookup rebuilds it.
+        Called by migrate_fixtures_to_sqlite after it inserts rows.
+        """
+        if league_id is None or league_id in self.league_ids:
+            self._h2h_index = None
+
+    @metrics.timed("h2h_lookup")
     def get_h2h_adjustment(self, home_team: str, away_team: str, k_factor: float, h2h_factor: float = 8) -> float:
         """
         Calculate the head-to-head adjustment factor between two teams.
@@ -164,69 +296,266 @@ class DataManager:
         Returns:
             float: The head-to-head adjustment value.
         """
-        games = self.get_games_between_teams(home_team, away_team)
-        total_games = len(games)
-        if total_games == 0:
+        pair = (home_team, away_team) if home_team <= away_team else (away_team, home_team)
+        entry = self._current_h2h_index().get(pair)
+        if entry is None:
             return 0  # No adjustment if no previous matches
 
-        h2h_score = 0  # Initialize H2H score
+        h2h_score, total_games = entry
+        if pair[0] != home_team:
+            h2h_score = -h2h_score
 
-        for game in games:
-            result = helper.get_match_result(game, home_team)  # +1 win, 0 draw, -1 loss
-            decay = helper.get_decay_factor(k_factor, game['date'])
-            h2h_score += result * decay
-
-        normalized_score = h2h_score / total_games
+        normalized_score = h2h_score * k_factor / total_games
         adjustment = normalized_score * h2h_factor
 
         return adjustment
 
-    def set_strength(self) -> None:
+    def _current_h2h_index(self) -> Dict[Tuple[str, str], Tuple[float, int]]:
+        # Decay is relative to today, so the index is rebuilt when the date changes
+        if self._h2h_index is None or self._h2h_index_date != date.today():
+            self._h2h_index = self.build_h2h_index()
+            self._h2h_index_date = date.today()
+        return self._h2h_index
+
+    @metrics.timed("h2h_batch_lookup")
+    def get_h2h_adjustments(self, home_teams, away_teams, k_factor: float, h2h_factor: float = 8) -> np.ndarray:
+        """
+        get_h2h_adjustment for many pairs at once.
+
+        Parameters:
+            home_teams (Sequence[str]): Home team of each pair.
+            away_teams (Sequence[str]): Away team of each pair, same length.
+            k_factor (float): K-factor used in Elo calculations.
+            h2h_factor (float): Scaling factor for H2H adjustment.
+
+        Returns:
+            np.ndarray: The head-to-head adjustment of each pair, 0 where the teams have not met.
+        """
+        index = self._current_h2h_index()
+        score = np.zeros(len(home_teams))
+        games = np.ones(len(home_teams))
+        for i, (home_team, away_team) in enumerate(zip(home_teams, away_teams)):
+            if home_team <= away_team:
+                entry = index.get((home_team, away_team))
+                sign = 1
+            else:
+                entry = index.get((away_team, home_team))
+                sign = -1
+            if entry is not None:
+                score[i] = sign * entry[0]
+                games[i] = entry[1]
+        return score * k_factor / games * h2h_factor
+
+    @metrics.timed("db_query", query="get_strength_counts")
+    def get_strength_counts(self) -> Dict[str, Dict[str, Tuple[int, int, int, int]]]:
+        """
+        Home/away games and wins per team and season, from one GROUP BY over matches.
+
+        Returns:
+            Dict[str, Dict[str, Tuple[int, int, int, int]]]: season -> team -> (home games, home wins,
+            away games, away wins). Seasons are in date order.
+        """
+        placeholders = ','.join(['?'] * len(self.league_ids))
+        query = f"""
+            SELECT season, team, MIN(date), SUM(is_home), SUM(is_home * won), SUM(1 - is_home), SUM((1 - is_home) * won)
+            FROM (
+                SELECT season, date, home_team AS team, 1 AS is_home, result = 'Home' AS won
+                FROM matches WHERE league_id IN ({placeholders})
+                UNION ALL
+                SELECT season, date, away_team AS team, 0 AS is_home, result = 'Away' AS won
+                FROM matches WHERE league_id IN ({placeholders})
+            )
+            GROUP BY season, team
+        """
+        counts, first_date = {}, {}
+        with self._connect() as conn:
+            for season, team, team_first_date, *row in conn.execute(query, self.league_ids * 2):
+                counts.setdefault(season, {})[team] = tuple(row)
+                first_date[season] = min(first_date.get(season, team_first_date), team_first_date)
+        return {season: counts[season] for season in sorted(counts, key=lambda season: (first_date[season], season))}
+
+    @staticmethod
+    def _strengths(counts: Dict[str, Tuple[int, int, int, int]]) -> Dict[str, Dict[str, Optional[float]]]:
+        """Win rates from (home games, home wins, away games, away wins); None where a team has no such games."""
+        return {
+            team: {
+                'home': home_wins / home_games if home_games else None,
+                'away': away_wins / away_games if away_games else None,
+            }
+            for team, (home_games, home_wins, away_games, away_wins) in counts.items()
+        }
+
+    @metrics.timed("db_query", query="set_strength")
+    def set_strength(self, window: Optional[int] = None) -> Dict[str, Dict[str, Dict[str, Optional[float]]]]:
         """
         Calculate and update home/away strengths for all teams into the database.
+
+        Strength is the share of home (away) games won. Counts come from one aggregate query,
+        so no fixture is loaded into Python.
+
+        Parameters:
+            window (int): Only count the last `window` seasons, for strengths that follow current form.
+                          By default every season is counted.
+
+        Returns:
+            Dict[str, Dict[str, Dict[str, Optional[float]]]]: Per-season strengths, season -> team -> {'home', 'away'},
+            from the same query.
         """
-        fixtures = self.get_fixtures()
+        season_counts = self.get_strength_counts()
+        seasons = list(season_counts)[-window:] if window else list(season_counts)
 
-        home_wins = {}
-        away_wins = {}
-        total_home_matches = {}
-        total_away_matches = {}
+        totals = {}
+        for season in seasons:
+            for team, row in season_counts[season].items():
+                total = totals.get(team, (0, 0, 0, 0))
+                totals[team] = tuple(a + b for a, b in zip(total, row))
 
-        for season, round_matches in fixtures.items():
-            for round_name, matches in round_matches.items():
-                for match in matches:
-                    home_team = match['home_team']
-                    away_team = match['away_team']
+        with self._connect() as conn:
+            conn.executemany(
+                "UPDATE teams SET home_strength = COALESCE(?, home_strength), "
+                "away_strength = COALESCE(?, away_strength) WHERE name = ?",
+                [(strength['home'], strength['away'], team) for team, strength in self._strengths(totals).items()]
+            )
 
-                    home_wins.setdefault(home_team, 0)
-                    away_wins.setdefault(away_team, 0)
-                    total_home_matches.setdefault(home_team, 0)
-                    total_away_matches.setdefault(away_team, 0)
+        return {season: self._strengths(counts) for season, counts in season_counts.items()}
 
-                    total_home_matches[home_team] += 1
-                    total_away_matches[away_team] += 1
+    def _league_key(self) -> str:
+        return ','.join(str(league_id) for league_id in sorted(self.league_ids))
 
-                    if match['result'] == 'Home':
-                        home_wins[home_team] += 1
-                    elif match['result'] == 'Away':
-                        away_wins[away_team] += 1
+    def get_last_match(self) -> Tuple[Optional[int], Optional[str]]:
+        """
+        Get the highest match id and latest match date across the configured leagues.
+        """
+        placeholders = ','.join(['?'] * len(self.league_ids))
+        query = f"SELECT MAX(id), MAX(date) FROM matches WHERE league_id IN ({placeholders})"
+        with self._connect() as conn:
+            return conn.execute(query, self.league_ids).fetchone()
 
-        home_strength = {
-            team: wins / total_home_matches[team]
-            for team, wins in home_wins.items() if total_home_matches[team] > 0
-        }
-        away_strength = {
-            team: wins / total_away_matches[team]
-            for team, wins in away_wins.items() if total_away_matches[team] > 0
+    @metrics.timed("db_query", query="get_matches_since")
+    def get_matches_since(self, last_match_id: int) -> Tuple[List[Match], bool]:
+        """
+        Fetch matches inserted after last_match_id, in the order a full replay walks them.
+
+        Parameters:
+            last_match_id (int): Highest match id already processed.
+
+        Returns:
+            Tuple[List[Match], bool]: Match records in the get_fixtures format, with their id set, and
+            whether a full replay would process all of them after every match up to last_match_id.
+            If not, applying them on top of a checkpoint gives different ratings than a replay.
+        """
+        placeholders = ','.join(['?'] * len(self.league_ids))
+        query = f"""
+            SELECT id, season, round, date, home_team, away_team, home_score, away_score, result, league_id,
+                position
+            FROM (
+                SELECT *, ROW_NUMBER() OVER (
+                    ORDER BY season_start, season, round_start, round, date, id
+                ) AS position
+                FROM (
+                    SELECT *,
+                        MIN(date) OVER (PARTITION BY season) AS season_start,
+                        MIN(date) OVER (PARTITION BY season, round) AS round_start
+                    FROM matches
+                    WHERE league_id IN ({placeholders})
+                )
+            )
+            WHERE id > ?
+            ORDER BY position
+        """
+        count_query = f"SELECT COUNT(*) FROM matches WHERE league_id IN ({placeholders}) AND id <= ?"
+        with self._connect() as conn:
+            rows = conn.execute(query, self.league_ids + [last_match_id]).fetchall()
+            n_processed = conn.execute(count_query, self.league_ids + [last_match_id]).fetchone()[0]
+
+        # The new matches take the last positions exactly when the first of them directly follows the processed ones
+        appends = not rows or rows[0][10] == n_processed + 1
+        return [records.match_from_row(*row[1:10], row[0]) for row in rows], appends
+
+    @metrics.timed("db_query", query="get_history_fingerprint")
+    def get_history_fingerprint(self, last_match_id: int) -> str:
+        """
+        Digest of everything a replay up to last_match_id reads from the database: the team strengths
+        (home advantage) and every match with an id up to last_match_id (teams, scores, dates, rounds).
+        Any edit to those, such as set_strength or a corrected score, changes it; new matches do not.
+        """
+        placeholders = ','.join(['?'] * len(self.league_ids))
+        digest = hashlib.sha1()
+        with self._connect() as conn:
+            for row in conn.execute(
+                f"SELECT name, home_strength, away_strength FROM teams WHERE league_id IN ({placeholders}) ORDER BY name",
+                self.league_ids
+            ):
+                digest.update(repr(row).encode())
+            digest.update(b"|")
+            for row in conn.execute(
+                f"""
+                SELECT id, league_id, season, round, date, home_team, away_team, home_score, away_score
+                FROM matches
+                WHERE league_id IN ({placeholders}) AND id <= ?
+                ORDER BY id
+                """,
+                self.league_ids + [last_match_id]
+            ):
+                digest.update(repr(row).encode())
+        return digest.hexdigest()
+
+    @metrics.timed("db_query", query="get_elo_checkpoint")
+    def get_elo_checkpoint(self) -> Optional[Dict[str, Any]]:
+        """
+        Load the saved Elo state for this set of leagues.
+
+        Returns:
+            Optional[Dict[str, Any]]: last_match_id, last_match_date, k_factor, initial_rating,
+            data_version and fingerprint (see get_history_fingerprint) at save time, ratings ({team: rating})
+            and gains ({team: [gain, ...]}), or None if nothing is saved.
+        """
+        migration.migrate_schema(self.db_path)
+        key = self._league_key()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT last_match_id, last_match_date, k_factor, initial_rating, data_version, fingerprint "
+                "FROM elo_checkpoints WHERE league_key = ?",
+                (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            teams = conn.execute(
+                "SELECT team, rating, gains FROM elo_checkpoint_teams WHERE league_key = ?", (key,)
+            ).fetchall()
+        return {
+            "last_match_id": row[0],
+            "last_match_date": row[1],
+            "k_factor": row[2],
+            "initial_rating": row[3],
+            "data_version": row[4],
+            "fingerprint": row[5],
+            "ratings": {team: rating for team, rating, _ in teams},
+            "gains": {team: json.loads(gains) for team, _, gains in teams},
         }
 
+    @metrics.timed("db_query", query="save_elo_checkpoint")
+    def save_elo_checkpoint(self, last_match_id: int, last_match_date: str, k_factor: float, initial_rating: float,
+                            ratings: Dict[str, float], gains: Dict[str, List[float]],
+                            data_version: Optional[int] = None, fingerprint: Optional[str] = None) -> None:
+        """
+        Replace the saved Elo state for this set of leagues, in one transaction.
+        """
+        migration.migrate_schema(self.db_path)
+        key = self._league_key()
         with self._connect() as conn:
-            for team, strength in home_strength.items():
-                conn.execute("UPDATE teams SET home_strength = ? WHERE name = ?", (strength, team))
-            for team, strength in away_strength.items():
-                conn.execute("UPDATE teams SET away_strength = ? WHERE name = ?", (strength, team))
-            conn.commit()
+            conn.execute(
+                "INSERT OR REPLACE INTO elo_checkpoints (league_key, last_match_id, last_match_date, k_factor, "
+                "initial_rating, data_version, fingerprint) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, last_match_id, last_match_date, k_factor, initial_rating, data_version, fingerprint)
+            )
+            conn.execute("DELETE FROM elo_checkpoint_teams WHERE league_key = ?", (key,))
+            conn.executemany(
+                "INSERT INTO elo_checkpoint_teams VALUES (?, ?, ?, ?)",
+                [(key, team, rating, json.dumps(list(gains.get(team, [])))) for team, rating in ratings.items()]
+            )
 
+    @metrics.timed("db_query", query="set_elo")
     def set_elo(self, elo: Dict[str, float]) -> None:
         """
         Update the Elo ratings for teams in the database.
@@ -235,8 +564,9 @@ class DataManager:
             elo (Dict[str, float]): A dictionary of Elo ratings for teams.
         """
         with self._connect() as conn:
-            for team, rating in elo.items():
-                conn.execute("UPDATE teams SET elo_rating = ? WHERE name = ?", (rating, team))
-            conn.commit()
+            conn.executemany(
+                "UPDATE teams SET elo_rating = ? WHERE name = ?",
+                [(rating, team) for team, rating in elo.items()]
+            )
 
 
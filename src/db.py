@@ -0,0 +1,76 @@
+import os
+import sqlite3
+import threading
+from typing import Dict, Optional
+
+"""
+This module contains the shared SQLite connection manager used by every data access in src/.
+
+Features:
+- One connection per thread (and per process, so forked workers never share a handle),
+  reused across calls instead of reconnecting for every query.
+- A larger prepared-statement cache, so the fixed queries in DataManager and helper
+  are compiled once per connection.
+- synchronous=NORMAL on every connection, and the WAL journal (so readers are not blocked by a
+  running import) once something writes: journal_mode is stored in the database file, so it is
+  switched by enable_wal from the write paths (migration.migrate_schema) and never by a plain
+  connection, which leaves a read-only user's database file untouched.
+- A configurable database path: the FOOTBALL_DB environment variable or set_default_db_path.
+
+Connections are shared, so callers must not close them. Use `with conn:` for transactions.
+"""
+
+DEFAULT_DB_PATH = os.environ.get("FOOTBALL_DB", "football.db")
+CACHED_STATEMENTS = 256
+
+_managers: Dict[str, "ConnectionManager"] = {}
+_managers_lock = threading.Lock()
+
+
+class ConnectionManager:
+    def __init__(self, db_path: str, cached_statements: int = CACHED_STATEMENTS):
+        self.db_path = db_path
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+
+    def connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, cached_statements=self.cached_statements)
+            conn.execute("PRAGMA synchronous = NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def close(self) -> None:
+        """Close this thread's connection, if any."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            conn.close()
+        self._local.conn = None
+
+
+def enable_wal(db_path: Optional[str] = None) -> None:
+    """Switch db_path to the WAL journal. Persistent, so only call it from code that writes anyway."""
+    connect(db_path).execute("PRAGMA journal_mode = WAL")
+
+
+def set_default_db_path(db_path: str) -> None:
+    global DEFAULT_DB_PATH
+    DEFAULT_DB_PATH = db_path
+
+
+def get_manager(db_path: Optional[str] = None) -> ConnectionManager:
+    """Return the shared manager for db_path (default: DEFAULT_DB_PATH)."""
+    db_path = db_path or DEFAULT_DB_PATH
+    manager = _managers.get(db_path)
+    if manager is None:
+        with _managers_lock:
+            manager = _managers.setdefault(db_path, ConnectionManager(db_path))
+    return manager
+
+
+def connect(db_path: Optional[str] = None) -> sqlite3.Connection:
+    """Return the calling thread's shared connection to db_path."""
+    return get_manager(db_path).connection()
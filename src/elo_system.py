@@ -1,7 +1,9 @@
 import math
 import random
 from collections import deque
+import numpy as np
 from . import helper
+from . import metrics
 from .data_manager import DataManager
 import logging
 
@@ -16,8 +18,27 @@ Features:
 """
 
 class EloRatingSystem:
-    def __init__(self, league_ids, initial_rating=1500, k_factor=3):
+    def __init__(self, league_ids, initial_rating=1500, k_factor=3, incremental=False, columnar=False, streaming=False,
+                 fused=False):
+        self._configure(league_ids, initial_rating, k_factor, incremental, columnar, streaming, fused)
 
+        self.team_ratings = self.DataManager.get_team_elos() # Elo ratings for teams in league
+        self.team_strengths = self.DataManager.get_team_strengths() # Home and away strengths for teams in league
+        self.future_matches = self.DataManager.get_future_matches() # Future match data
+        if incremental:
+            # History is only loaded if the checkpoint cannot be used, see run_elo_rating_system
+            self.team_form, self.gains = {}, {}
+        elif fused:
+            # Form tracking for teams, filled in by run_elo_rating_system
+            self.load_history()
+            self.team_form, self.gains = {}, {}
+        else:
+            self.load_history()
+            self.team_form, self.gains = self.init_form() # Form tracking for teams
+
+    def _configure(self, league_ids, initial_rating=1500, k_factor=3, incremental=False, columnar=False,
+                   streaming=False, fused=False, db_path=None):
+        """Parameters and mode flags, without touching the model state. Shared by __init__ and from_state."""
         self.league_initial_ratings = {
             103: 1500,  # Eliteserien
             104: 1300,   # OBOS-ligaen
@@ -31,13 +52,38 @@ class EloRatingSystem:
 
         self.initial_rating = initial_rating
         self.k_factor = k_factor
-        self.DataManager = DataManager(league_ids)
-
-        self.team_ratings = self.DataManager.get_team_elos() # Elo ratings for teams in league
-        self.team_strengths = self.DataManager.get_team_strengths() # Home and away strengths for teams in league
-        self.fixtures = self.DataManager.get_fixtures() # Historical match data
-        self.future_matches = self.DataManager.get_future_matches() # Future match data
-        self.team_form, self.gains = self.init_form() # Form tracking for teams
+        self.incremental = incremental # Resume from the saved checkpoint instead of replaying all history
+        self.columnar = columnar # Replay history from a FixtureStore instead of nested dicts
+        self.streaming = streaming # Replay history straight from the cursor, nothing is kept in memory
+        self.fused = fused # Compute form and gains during the process_season replay instead of in a separate init_form pass
+        self.DataManager = DataManager(league_ids, db_path)
+        self.fixtures = {} # Historical match data, when not columnar
+        self.fixture_store = None # Historical match data, when columnar
+
+    @classmethod
+    def from_state(cls, league_ids, team_ratings, team_form, gains, team_strengths, fixture_store, future_matches,
+                   initial_rating=1500, k_factor=3, db_path=None, **modes):
+        """
+        A fitted model from saved state (see snapshot.load_snapshot), without loading or replaying anything.
+        modes are the keyword flags of __init__; columnar defaults to True, since the history is a FixtureStore.
+        """
+        model = cls.__new__(cls)
+        model._configure(league_ids, initial_rating, k_factor, db_path=db_path, **{'columnar': True, **modes})
+        model.team_ratings = team_ratings
+        model.team_form = team_form
+        model.gains = gains
+        model.team_strengths = team_strengths
+        model.fixture_store = fixture_store
+        model.future_matches = future_matches
+        return model
+
+    def load_history(self):
+        if self.streaming:
+            return # history_rows reads from the database on every pass
+        if self.columnar:
+            self.fixture_store = self.DataManager.get_fixture_store()
+        else:
+            self.fixtures = self.DataManager.get_fixtures()
 
 
     def initialize_team_ratings(self):
@@ -45,53 +91,77 @@ class EloRatingSystem:
 
         # Step 1: Gather all teams
         all_teams = set(self.team_strengths.keys())
+        if self.fixture_store is not None:
+            all_teams.update(self.fixture_store.teams)
+        streamed_2024 = {}
+        if self.streaming:
+            for match in self.DataManager.iter_fixtures():
+                all_teams.update([match.home_team, match.away_team])
+                if match.season == "2024":
+                    streamed_2024.setdefault(match.round, []).append(match)
         for season in self.fixtures.values():
             for round_matches in season.values():
                 for match in round_matches:
-                    all_teams.update([match['home_team'], match['away_team']])
+                    all_teams.update([match.home_team, match.away_team])
         for season in self.future_matches.values():
             for round_matches in season.values():
                 for match in round_matches:
-                    all_teams.update([match['home_team'], match['away_team']])
+                    all_teams.update([match.home_team, match.away_team])
 
         # Step 2: Get team league mappings
         team_league_map = {}
 
-        season_2024 = self.fixtures.get("2024", {})
+        season_2024 = self.fixtures.get("2024", streamed_2024)
 
         for round_data in season_2024.values():
             for match in round_data:
-                league_id = match.get("league_id", 105)  # Default to Eliteserien
-                home_team = match["home_team"].upper()
-                away_team = match["away_team"].upper()
+                league_id = match.league_id
+                home_team = match.home_team.upper()
+                away_team = match.away_team.upper()
 
                 team_league_map[home_team] = league_id
                 team_league_map[away_team] = league_id
 
+        if self.fixture_store is not None:
+            store = self.fixture_store
+            in_2024 = store.season_mask("2024")
+            for home, away, league_id in zip(store.home[in_2024].tolist(), store.away[in_2024].tolist(),
+                                             store.league_id[in_2024].tolist()):
+                team_league_map[store.teams[home].upper()] = league_id
+                team_league_map[store.teams[away].upper()] = league_id
+
         # Step 3: Assign rating based on league
         for team in sorted(all_teams):
-            league_id = team_league_map.get(team, 105)  # Default to top league if unknown
-            base_rating = self.league_initial_ratings.get(league_id, self.initial_rating)
-            self.team_ratings[team] = base_rating
+            self.team_ratings[team] = self.starting_rating(team_league_map.get(team))
 
         print("\n📊 Team Elo Ratings (By Division):")
         for team, rating in sorted(self.team_ratings.items(), key=lambda x: x[1], reverse=True):
             print(f" - {team:<20} {rating:.2f}")
 
 
+    def starting_rating(self, league_id=None):
+        """The rating a team starts from: that of the league it played in in 2024, or of league 105 if none."""
+        if league_id is None:
+            league_id = 105  # Default to the lowest tracked league if unknown
+        return self.league_initial_ratings.get(league_id, self.initial_rating)
+
     def update_rating(self, adjusted_k, current_rating, actual_score, expected_score, decay_factor):
         """Update the Elo rating for a team."""
         return current_rating + adjusted_k * decay_factor * (actual_score - expected_score)
 
     def process_game(self, game):
          """Process a single game and update team ratings."""
-         home_team = game['home_team']
-         away_team = game['away_team']
-         home_score = game['score']['home']
-         away_score = game['score']['away']
-         match_date = game['date']
-         league_id = game['league_id']
-
+         self.process_result(
+             game.home_team, game.away_team, game.score.home, game.score.away,
+             game.league_id, helper.get_log_age(game.date, True)
+         )
+
+    @metrics.timed("elo_game")
+    def process_result(self, home_team, away_team, home_score, away_score, league_id, log_age):
+         """
+         Update team ratings from one result.
+         log_age is log(days since the match + 10), see helper.get_log_age and FixtureStore.log_ages.
+         """
          scaling_factor = 1 if league_id == 103 else 0.9
  
          # Initialize team ratings if they don't exist
@@ -134,7 +204,7 @@ class EloRatingSystem:
          weight = self.league_weights.get(league_id, 1.0)
 
          adjusted_k = self.k_factor * weight
-         decay_factor = helper.get_decay_factor(adjusted_k, match_date, True)
+         decay_factor = adjusted_k / log_age
 
          new_rating_home = self.update_rating(adjusted_k, rating_home, actual_home, expected_home, decay_factor)
          new_rating_away = self.update_rating(adjusted_k, rating_away, actual_away, expected_away, decay_factor)
@@ -152,23 +222,116 @@ class EloRatingSystem:
         for game in games:
             self.process_game(game)
 
+    @metrics.timed("elo_phase", phase="process_season")
     def process_season(self):
+        if self.fixture_store is not None or self.streaming:
+            for row in self.history_rows():
+                self.process_result(*row)
+            return
         for season in self.fixtures:
             for rnd in self.fixtures[season]:
                 self.process_round(self.fixtures[season][rnd])
 
+    @metrics.timed("elo_phase", phase="run_elo_rating_system")
     def run_elo_rating_system(self):
-        self.initialize_team_ratings()
-        self.process_season()
+        if self.incremental and self.apply_new_matches():
+            return
+
+        if self.incremental:
+            self.load_history()
+            if not self.fused:
+                self.team_form, self.gains = self.init_form()
 
-    def calculate_match_probabilities(self, home_team, away_team):
-        rating_home = self.team_ratings.get(home_team, self.initial_rating)
+        self.initialize_team_ratings()
+        if self.fused:
+            self.team_form, self.gains = self.process_season_with_form()
+        else:
+            self.process_season()
+
+        if self.incremental:
+            self.save_checkpoint()
+
+    def save_checkpoint(self, last_match_id=None, last_match_date=None):
+        """Persist ratings and gain deques together with the last processed match."""
+        if last_match_id is None:
+            last_match_id, last_match_date = self.DataManager.get_last_match()
+        last_match_id = last_match_id or 0
+        self.DataManager.save_elo_checkpoint(
+            last_match_id, last_match_date, self.k_factor, self.initial_rating,
+            self.team_ratings, self.gains,
+            helper.get_data_version(self.DataManager.db_path),
+            self.DataManager.get_history_fingerprint(last_match_id)
+        )
+
+    @metrics.timed("elo_phase", phase="apply_new_matches")
+    def apply_new_matches(self):
+        """
+        Resume from the saved checkpoint and process only matches inserted since.
+
+        Returns False, leaving the model untouched, when there is no usable checkpoint:
+        none saved, different parameters, a change to the data it was computed from (a processed
+        match edited or removed, or team strengths updated), or a new match that a full replay
+        would process before an already processed one (an earlier date, season or round, e.g. a
+        postponed game).
+        """
+        checkpoint = self.DataManager.get_elo_checkpoint()
+        if checkpoint is None:
+            return False
+        if checkpoint['k_factor'] != self.k_factor or checkpoint['initial_rating'] != self.initial_rating:
+            return False
+
+        new_matches, appends = self.DataManager.get_matches_since(checkpoint['last_match_id'])
+
+        # Every write bumps the data version once per row, so appending the new matches alone adds exactly
+        # len(new_matches); anything else was written too and the history is compared in full.
+        data_version = helper.get_data_version(self.DataManager.db_path)
+        only_appended = (
+            data_version is not None and checkpoint['data_version'] is not None
+            and data_version == checkpoint['data_version'] + len(new_matches)
+        )
+        if not only_appended and (
+            checkpoint['fingerprint'] is None
+            or self.DataManager.get_history_fingerprint(checkpoint['last_match_id']) != checkpoint['fingerprint']
+        ):
+            logging.info("Processed matches or team strengths changed since the Elo checkpoint — replaying full history.")
+            return False
+        if not appends:
+            logging.info("New matches fall before the Elo checkpoint in replay order — replaying full history.")
+            return False
+
+        self.team_ratings = checkpoint['ratings']
+        self.gains = {team: deque(gains, maxlen=3) for team, gains in checkpoint['gains'].items()}
+        self.team_form = {team: self.weighted_form(gains) for team, gains in self.gains.items()}
+
+        # Teams new to the checkpoint start as initialize_team_ratings would start them
+        team_league_map = {}
+        for match in new_matches:
+            if match.season == "2024":
+                team_league_map[match.home_team.upper()] = match.league_id
+                team_league_map[match.away_team.upper()] = match.league_id
+
+        for match in new_matches:
+            home_team = match.home_team
+            away_team = match.away_team
+            for team in (home_team, away_team):
+                if team not in self.team_ratings:
+                    self.team_ratings[team] = self.starting_rating(team_league_map.get(team))
+                self.gains.setdefault(team, deque(maxlen=3))
+            self.update_form(match, home_team, away_team)
+
+        if new_matches:
+            self.save_checkpoint(max(match.id for match in new_matches), max(match.date for match in new_matches))
+        return True
+
+    def calculate_match_probabilities(self, home_team, away_team, advantage=100, adjustment_factor=0):
+        rating_home = self.team_ratings.get(home_team, self.initial_rating) + adjustment_factor
         rating_away = self.team_ratings.get(away_team, self.initial_rating)
 
-        form_home = sum(self.team_form[home_team]) / len(self.team_form[home_team]) if self.team_form[home_team] else 0.5
-        form_away = sum(self.team_form[away_team]) / len(self.team_form[away_team]) if self.team_form[away_team] else 0.5
+        gains_home = self.gains.get(home_team)
+        gains_away = self.gains.get(away_team)
+        form_home = sum(gains_home) / len(gains_home) if gains_home else 0.5
+        form_away = sum(gains_away) / len(gains_away) if gains_away else 0.5
 
-        advantage = 100
         base_prob = self.calculate_expected_score(rating_home, rating_away, advantage)
         adjusted = base_prob * 0.7 + form_home * 0.15 + (1 - form_away) * 0.15
 
@@ -178,41 +341,143 @@ class EloRatingSystem:
             'away_win': round(1 - adjusted, 3)
         }
 
+    def calculate_match_probabilities_batch(self, home_teams, away_teams, advantage=100, adjustment_factor=0):
+        """
+        calculate_match_probabilities for many pairs in one vectorized call.
+
+        advantage and adjustment_factor are scalars or arrays with one value per pair.
+        Ratings and form are looked up once per distinct team.
+
+        Returns:
+            Dict[str, np.ndarray]: 'home_win', 'draw' and 'away_win', one value per pair, rounded as in
+            calculate_match_probabilities.
+        """
+        teams, inverse = np.unique(np.array(list(home_teams) + list(away_teams), dtype=object), return_inverse=True)
+        home_idx, away_idx = inverse[:len(inverse) // 2], inverse[len(inverse) // 2:]
+
+        ratings = np.array([self.team_ratings.get(team, self.initial_rating) for team in teams], dtype=float)
+        form = np.array([
+            sum(gains) / len(gains) if gains else 0.5
+            for gains in (self.gains.get(team) for team in teams)
+        ], dtype=float)
+
+        base_prob = helper.expected_scores(ratings[home_idx] + adjustment_factor, ratings[away_idx], advantage)
+        adjusted = base_prob * 0.7 + form[home_idx] * 0.15 + (1 - form[away_idx]) * 0.15
+
+        return {
+            'home_win': np.round(adjusted, 3),
+            'draw': np.round(1 - np.abs(0.5 - adjusted), 3),
+            'away_win': np.round(1 - adjusted, 3)
+        }
+
+    def history_rows(self):
+        """
+        (home_team, away_team, home_score, away_score, league_id, log_age) for every historical match,
+        in replay order, from the FixtureStore, the nested fixtures or, when streaming, the database cursor.
+        """
+        if self.fixture_store is not None:
+            store = self.fixture_store
+            teams = store.teams
+            return zip(
+                [teams[i] for i in store.home.tolist()],
+                [teams[i] for i in store.away.tolist()],
+                store.home_score.tolist(),
+                store.away_score.tolist(),
+                store.league_id.tolist(),
+                store.log_ages(True).tolist(),
+            )
+        if self.streaming:
+            matches = self.DataManager.iter_fixtures(by_round=True)
+        else:
+            matches = (match for rounds in self.fixtures.values() for matches in rounds.values() for match in matches)
+        return (
+            (match.home_team, match.away_team, match.score.home, match.score.away,
+             match.league_id, helper.get_log_age(match.date, True))
+            for match in matches
+        )
+
+    def short_season(self):
+        """The first season with fewer than 3 rounds, if any. Form is not tracked when there is one."""
+        if self.fixture_store is not None:
+            rounds_per_season = self.fixture_store.rounds_per_season()
+        elif self.streaming:
+            rounds_per_season = self.DataManager.get_rounds_per_season()
+        else:
+            rounds_per_season = {season: len(rounds) for season, rounds in self.fixtures.items()}
+
+        for season, n_rounds in rounds_per_season.items():
+            if n_rounds < 3:
+                return season
+        return None
+
+    @metrics.timed("elo_phase", phase="process_season_with_form")
+    def process_season_with_form(self):
+        """
+        process_season and form tracking in one ordered pass over the history.
+
+        Gains are the rating changes of the replay itself, so form reflects the fitted ratings.
+        (init_form replays every game against the starting ratings and undoes it.)
+
+        Returns:
+            Tuple[Dict[str, float], Dict[str, deque]]: Weighted form and the last three gains per team.
+        """
+        season = self.short_season()
+        if season is not None:
+            logging.warning(f"⏸ Season {season} has fewer than 3 rounds — skipping form calc.")
+            self.process_season()
+            return (
+                {team: 0.0 for team in self.team_ratings},
+                {team: deque(maxlen=3) for team in self.team_ratings}
+            )
+
+        ratings = self.team_ratings
+        initial_rating = self.initial_rating
+        gains = {team: deque(maxlen=3) for team in ratings}
+        for row in self.history_rows():
+            home_team, away_team = row[0], row[1]
+            rating_home = ratings.get(home_team, initial_rating)
+            rating_away = ratings.get(away_team, initial_rating)
+
+            self.process_result(*row)
+
+            gains.setdefault(home_team, deque(maxlen=3)).append(ratings[home_team] - rating_home)
+            gains.setdefault(away_team, deque(maxlen=3)).append(ratings[away_team] - rating_away)
+
+        return {team: self.weighted_form(gains[team]) for team in ratings}, gains
+
+    @metrics.timed("elo_phase", phase="init_form")
     def init_form(self):
         logging.basicConfig(level=logging.INFO)
         """Calculate the initial form of each team based on recent performance."""
         form_deques = {team: deque(maxlen=3) for team in self.team_ratings}
 
-        for season, rounds in self.fixtures.items():
-            if len(rounds) < 3:
-                logging.warning(f"⏸ Season {season} has fewer than 3 rounds — skipping form calc.")
-                return (
-                    {team: 0.0 for team in self.team_ratings},
-                    {team: deque(maxlen=3) for team in self.team_ratings}
-                )
+        # Ratings are restored after every game below, so checking up front is the same as stopping midway
+        season = self.short_season()
+        if season is not None:
+            logging.warning(f"⏸ Season {season} has fewer than 3 rounds — skipping form calc.")
+            return (
+                {team: 0.0 for team in self.team_ratings},
+                {team: deque(maxlen=3) for team in self.team_ratings}
+            )
 
-            for round_name, matches in rounds.items():
-                for match in matches:
-                    home_team = match['home_team']
-                    away_team = match['away_team']
+        for home_team, away_team, home_score, away_score, league_id, log_age in self.history_rows():
+            if home_team not in self.team_ratings or away_team not in self.team_ratings:
+                logging.warning(f"⚠️ Skipping match {home_team} vs {away_team} — team(s) missing rating.")
+                continue
 
-                    if home_team not in self.team_ratings or away_team not in self.team_ratings:
-                        logging.warning(f"⚠️ Skipping match {home_team} vs {away_team} — team(s) missing rating.")
-                        continue
+            initial_rating_home = self.team_ratings[home_team]
+            initial_rating_away = self.team_ratings[away_team]
 
-                    initial_rating_home = self.team_ratings[home_team]
-                    initial_rating_away = self.team_ratings[away_team]
+            self.process_result(home_team, away_team, home_score, away_score, league_id, log_age)
 
-                    self.process_game(match)
+            gain_home = self.team_ratings[home_team] - initial_rating_home
+            gain_away = self.team_ratings[away_team] - initial_rating_away
 
-                    gain_home = self.team_ratings[home_team] - initial_rating_home
-                    gain_away = self.team_ratings[away_team] - initial_rating_away
+            self.team_ratings[home_team] = initial_rating_home
+            self.team_ratings[away_team] = initial_rating_away
 
-                    self.team_ratings[home_team] = initial_rating_home
-                    self.team_ratings[away_team] = initial_rating_away
-
-                    form_deques[home_team].append(gain_home)
-                    form_deques[away_team].append(gain_away)
+            form_deques[home_team].append(gain_home)
+            form_deques[away_team].append(gain_away)
 
         weights = [math.log(i ** 2 + 1) for i in range(1, 4)]
         total_weight = sum(weights)
@@ -250,16 +515,19 @@ class EloRatingSystem:
         self.gains[away_team].append(gain_away)
 
         # Recalculate team form
+        for team in [home_team, away_team]:
+            self.team_form[team] = self.weighted_form(self.gains[team])
+
+    def weighted_form(self, gains):
+        """Weighted sum of the last three gains, padded with zeros, most recent weighted highest."""
         weights = [math.log(i ** 2 + 1) for i in range(1, 4)]
         total_weight = sum(weights)
         normalized_weights = [w / total_weight for w in weights]
 
-        for team in [home_team, away_team]:
-            gains = list(self.gains[team])
-            if len(gains) < 3:
-                gains = [0] * (3 - len(gains)) + gains
-            weighted_sum = sum(g * w for g, w in zip(gains, normalized_weights))
-            self.team_form[team] = weighted_sum
+        gains = list(gains)
+        if len(gains) < 3:
+            gains = [0] * (3 - len(gains)) + gains
+        return sum(g * w for g, w in zip(gains, normalized_weights))
 
     def calculate_expected_score(self, rating_a, rating_b, home_field_advantage):
          """Calculate the expected score for a team."""
@@ -0,0 +1,146 @@
+import math
+from datetime import date, datetime
+import numpy as np
+from .helper import FIXED_REFERENCE_DATE
+
+"""
+This module contains the FixtureStore class, a columnar alternative to the nested
+season -> round -> list-of-dict fixtures returned by DataManager.
+
+Each field is one NumPy array with one entry per match: team indices, scores, league ids,
+season and round codes and the match date as an ordinal day. Dates are parsed once, when
+the store is built, so the Elo and form loops never call datetime.fromisoformat.
+
+Rows are kept in replay order: seasons and rounds in order of first appearance, matches
+by date within a round. This is the order in which EloRatingSystem walks the nested dicts.
+"""
+
+
+class FixtureStore:
+    def __init__(self, teams, seasons, rounds, home, away, home_score, away_score, league_id, season, round_, day, dates):
+        self.teams = teams # Team names, indexed by the values in home/away
+        self.team_index = {team: i for i, team in enumerate(teams)}
+        self.seasons = seasons # Season labels, indexed by the values in season
+        self.rounds = rounds # Round labels, indexed by the values in round
+        self.home = home
+        self.away = away
+        self.home_score = home_score # None for future matches
+        self.away_score = away_score
+        self.league_id = league_id
+        self.season = season
+        self.round = round_
+        self.day = day # date.toordinal() of the match date
+        self.dates = dates # Original ISO strings
+        self._log_ages = {}
+
+    @classmethod
+    def from_rows(cls, rows, with_scores=True):
+        """
+        Build a store from (season, round, date, home_team, away_team[, home_score, away_score], league_id)
+        rows sorted by date, as returned by the DataManager queries.
+        """
+        teams, team_index = [], {}
+        seasons, season_index = [], {}
+        rounds, round_index = [], {}
+        round_order = {}
+
+        def code(value, values, index):
+            i = index.get(value)
+            if i is None:
+                i = index[value] = len(values)
+                values.append(value)
+            return i
+
+        columns = {name: [] for name in ('home', 'away', 'home_score', 'away_score', 'league_id', 'season', 'round', 'day', 'date')}
+        order_keys = []
+        for row in rows:
+            if with_scores:
+                season, rnd, match_date, home_team, away_team, home_score, away_score, league_id = row
+                columns['home_score'].append(home_score)
+                columns['away_score'].append(away_score)
+            else:
+                season, rnd, match_date, home_team, away_team, league_id = row
+
+            season_code = code(season, seasons, season_index)
+            round_code = code(rnd, rounds, round_index)
+            round_rank = round_order.setdefault((season_code, round_code), len(round_order))
+
+            columns['home'].append(code(home_team, teams, team_index))
+            columns['away'].append(code(away_team, teams, team_index))
+            columns['league_id'].append(league_id)
+            columns['season'].append(season_code)
+            columns['round'].append(round_code)
+            columns['day'].append(datetime.fromisoformat(match_date).date().toordinal())
+            columns['date'].append(match_date)
+            order_keys.append((season_code, round_rank))
+
+        # Group by season, then round, in order of first appearance; stable, so date order is kept within a round
+        order = np.lexsort((
+            np.array([key[1] for key in order_keys], dtype=np.int64),
+            np.array([key[0] for key in order_keys], dtype=np.int64),
+        ))
+
+        def column(name, dtype):
+            return np.array(columns[name], dtype=dtype)[order]
+
+        return cls(
+            teams, seasons, rounds,
+            column('home', np.int32),
+            column('away', np.int32),
+            column('home_score', np.int16) if with_scores else None,
+            column('away_score', np.int16) if with_scores else None,
+            column('league_id', np.int32),
+            column('season', np.int32),
+            column('round', np.int32),
+            column('day', np.int32),
+            column('date', object),
+        )
+
+    def __len__(self):
+        return len(self.home)
+
+    def log_ages(self, use_fixed_reference_date=False):
+        """
+        log(days since match + 10) per match, the denominator of helper.get_decay_factor.
+        Cached per reference date, so a decay factor is k / log_ages()[i].
+        """
+        reference = FIXED_REFERENCE_DATE if use_fixed_reference_date else date.today()
+        log_ages = self._log_ages.get(reference)
+        if log_ages is None:
+            # math.log rather than np.log, so results match helper.get_decay_factor bit for bit
+            reference_day = reference.toordinal()
+            log_ages = self._log_ages[reference] = np.array(
+                [math.log(max(reference_day - day, 1) + 10) for day in self.day.tolist()]
+            )
+        return log_ages
+
+    def rounds_per_season(self):
+        """{season label: number of distinct rounds}"""
+        counts = {season: 0 for season in self.seasons}
+        for season_code, _ in sorted(set(zip(self.season.tolist(), self.round.tolist()))):
+            counts[self.seasons[season_code]] += 1
+        return counts
+
+    def select(self, mask):
+        """
+        A store with only the rows in mask (a boolean mask or an index array), in the same order.
+        Team, season and round labels are shared with this store, so codes stay comparable.
+        """
+        view = FixtureStore.__new__(FixtureStore)
+        view.teams, view.team_index = self.teams, self.team_index
+        view.seasons, view.rounds = self.seasons, self.rounds
+        for name in ('home', 'away', 'home_score', 'away_score', 'league_id', 'season', 'round', 'day', 'dates'):
+            column = getattr(self, name)
+            setattr(view, name, None if column is None else column[mask])
+        view._log_ages = {reference: log_ages[mask] for reference, log_ages in self._log_ages.items()}
+        return view
+
+    def league_mask(self, league_id):
+        """Boolean mask of the matches played in the given league."""
+        return self.league_id == league_id
+
+    def season_mask(self, season):
+        """Boolean mask of the matches in the given season label."""
+        if season not in self.seasons:
+            return np.zeros(len(self), dtype=bool)
+        return self.season == self.seasons.index(season)
@@ -1,9 +1,15 @@
 from collections import defaultdict
+from functools import lru_cache
 import math
-from datetime import datetime
+from datetime import datetime, timedelta
 import sqlite3
+import time
+from typing import Dict, Iterable, Optional
+from . import db
 from datetime import date
 
+FIXED_REFERENCE_DATE = date(2024, 12, 10)
+
 
 def determine_result(fixture):
     home_win = fixture['teams']['home']['winner']
@@ -18,9 +24,8 @@ def determine_result(fixture):
     else:
         return None 
 
-def percentage_of_draws(league_id: int) -> float:
-    conn = sqlite3.connect("football.db")
-    c = conn.cursor()
+def percentage_of_draws(league_id: int, db_path: Optional[str] = None) -> float:
+    c = db.connect(db_path).cursor()
 
     c.execute("""
         SELECT COUNT(*) FROM matches
@@ -34,14 +39,11 @@ def percentage_of_draws(league_id: int) -> float:
     """, (league_id,))
     draws = c.fetchone()[0]
 
-    conn.close()
-
     return draws / total_games if total_games else 0.0
 
-def get_table(league_id: int):
+def get_table(league_id: int, db_path: Optional[str] = None):
     standings = {}
-    conn = sqlite3.connect("football.db")
-    c = conn.cursor()
+    c = db.connect(db_path).cursor()
 
     c.execute("""
         SELECT team, points FROM table_standings
@@ -52,9 +54,21 @@ def get_table(league_id: int):
         team, points = row
         standings[team.upper()] = points
 
-    conn.close()
     return standings
 
+def get_data_version(db_path: Optional[str] = None) -> Optional[int]:
+    """
+    Counter bumped by every write to matches, future_matches, teams or table_standings.
+    None for a database that has not been migrated yet (no data_version table): no version can be trusted.
+    """
+    c = db.connect(db_path).cursor()
+    try:
+        c.execute("SELECT version FROM data_version WHERE id = 1")
+    except sqlite3.OperationalError:
+        return None
+    row = c.fetchone()
+    return row[0] if row else None
+
 def analyze_simulations(all_simulations):
     # Step 1: Aggregate Position Counts
     position_counts = defaultdict(lambda: defaultdict(int))
@@ -81,11 +95,10 @@ def analyze_simulations(all_simulations):
     return position_probabilities
 
 def get_match_result(game, team):
-    """Get the match result from the perspective of the given team."""
-    home_team = game['home_team']
-    away_team = game['away_team']
-    home_score = game['score']['home']
-    away_score = game['score']['away']
+    """Get the match result from the perspective of the given team. game is a records.Match."""
+    home_team = game.home_team
+    away_team = game.away_team
+    home_score, away_score = game.score
 
     if home_team == team:
         team_goals = home_score
@@ -105,16 +118,78 @@ def get_match_result(game, team):
 
 
 
-def get_decay_factor(k_factor, game_date_str, use_fixed_reference_date=False):
+# Decay only depends on (k, match date, reference date), and the same few thousand match dates
+# are looked up for every game in init_form, process_season, the H2H index and every simulation.
+# The reference date is part of the key, so entries computed against today expire at midnight.
+@lru_cache(maxsize=1 << 16)
+def _log_age(game_date_str, reference_ordinal):
     game_date = datetime.fromisoformat(game_date_str).date()
-    reference_date = date(2024, 12, 10) if use_fixed_reference_date else datetime.now().date()
-    days = max((reference_date - game_date).days, 1)
-    return k_factor / math.log(days + 10)
+    days = max(reference_ordinal - game_date.toordinal(), 1)
+    return math.log(days + 10)
+
+@lru_cache(maxsize=1 << 16)
+def _decay_factor(k_factor, game_date_str, reference_ordinal):
+    return k_factor / _log_age(game_date_str, reference_ordinal)
+
+_FIXED_REFERENCE_ORDINAL = FIXED_REFERENCE_DATE.toordinal()
+_today_ordinal, _today_expires = 0, 0.0
+
+def _reference_ordinal(use_fixed_reference_date=False):
+    # date.today() costs more than the cached lookup itself, so today's ordinal is kept until local midnight
+    global _today_ordinal, _today_expires
+    if use_fixed_reference_date:
+        return _FIXED_REFERENCE_ORDINAL
+    now = time.time()
+    if now >= _today_expires:
+        today = date.fromtimestamp(now)
+        _today_ordinal = today.toordinal()
+        _today_expires = datetime.combine(today + timedelta(days=1), datetime.min.time()).timestamp()
+    return _today_ordinal
+
+def get_log_age(game_date_str, use_fixed_reference_date=False):
+    return _log_age(game_date_str, _reference_ordinal(use_fixed_reference_date))
+
+def get_decay_factor(k_factor, game_date_str, use_fixed_reference_date=False):
+    return _decay_factor(k_factor, game_date_str, _reference_ordinal(use_fixed_reference_date))
+
+def get_decay_table(k_factor, game_date_strs: Iterable[str], use_fixed_reference_date=False) -> Dict[str, float]:
+    """{date: decay factor} for a run, so loops over the same matches skip even the cache lookup."""
+    reference_ordinal = _reference_ordinal(use_fixed_reference_date)
+    return {game_date_str: _decay_factor(k_factor, game_date_str, reference_ordinal) for game_date_str in game_date_strs}
+
+def expected_scores(rating_a, rating_b, home_field_advantage):
+    """
+    EloRatingSystem.calculate_expected_score, elementwise over NumPy arrays.
+    Same operations in the same order, so results match the scalar path exactly.
+    """
+    return 1 / (1 + 10 ** ((rating_b - rating_a + home_field_advantage) / 400))
+
 
 
+def analyze_rank_counts(teams, counts, total_simulations):
+    """Same output as analyze_simulations, built from a (team x position) count matrix."""
+    position_probabilities = defaultdict(dict)
+    for team, positions in zip(teams, counts):
+        for position, count in enumerate(positions, start=1):
+            if count:
+                position_probabilities[team][position] = (int(count) / total_simulations) * 100
+
+    max_positions = 16
+    for team in position_probabilities:
+        for pos in range(1, max_positions + 1):
+            position_probabilities[team].setdefault(pos, 0.0)
+
+    return position_probabilities
 
 def print_rank_probability_distribution(data):
-    data = analyze_simulations(data)
+    # Either a list of team_points dicts or a RankAccumulator snapshot
+    if isinstance(data, dict):
+        data = data['rank_probabilities']
+    else:
+        data = analyze_simulations(data)
+    return format_rank_probability_distribution(data)
+
+def format_rank_probability_distribution(data):
     # Calculate the dash line length dynamically based on column width
     dash_line_length = 20 + (17 * 7) + 10
     dash_line = "-" * dash_line_length
@@ -0,0 +1,197 @@
+import json
+import logging
+import os
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+import numpy as np
+from . import db
+from . import migration
+from . import snapshot
+from . import vectorized_sim
+from .accumulator import RankAccumulator
+from .sim import Simulator
+
+"""
+This module contains the JobQueue class, which runs long season simulations in the background.
+
+Jobs live in the simulation_jobs table, so any web worker can read progress or request
+cancellation, not just the one that submitted the job. Each job runs the batched engine
+in a thread pool. After every batch it writes the number of completed simulations and
+an accumulator snapshot (the partial rank histogram), and checks whether it was cancelled.
+
+Statuses: queued -> running -> done | cancelled | failed.
+
+Every job records its owner (host and pid of the process running it) and a heartbeat,
+refreshed by that process while the job is queued or running. Several web workers can
+share the table: a worker only marks a job failed once its heartbeat is older than
+stale_after, i.e. its owner has stopped or crashed.
+"""
+
+HEARTBEAT_INTERVAL = 10 # Seconds between heartbeats of a process's unfinished jobs
+STALE_AFTER = 60 # Seconds without a heartbeat after which an unfinished job is considered orphaned
+
+class JobQueue:
+    def __init__(self, db_path: Optional[str] = None, max_workers: int = 2, batch_size: int = 1000,
+                 heartbeat_interval: float = HEARTBEAT_INTERVAL, stale_after: float = STALE_AFTER):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.stale_after = stale_after
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sim-job")
+
+        migration.migrate_schema(db_path)
+        self.expire_stale_jobs()
+
+        self._stopped = threading.Event()
+        self._heartbeat = threading.Thread(
+            target=self._heartbeat_loop, args=(heartbeat_interval,), name="sim-job-heartbeat", daemon=True
+        )
+        self._heartbeat.start()
+
+    def _connect(self):
+        return db.connect(self.db_path)
+
+    def _now(self) -> str:
+        return datetime.now().isoformat(timespec='seconds')
+
+    def _heartbeat_loop(self, interval: float) -> None:
+        while not self._stopped.wait(interval):
+            try:
+                self.beat()
+                self.expire_stale_jobs()
+            except Exception as e:
+                # A locked database must not kill the heartbeat; the next beat retries
+                logging.warning(f"⚠️ Simulation job heartbeat failed: {e!r}")
+
+    def beat(self) -> None:
+        """Refresh the heartbeat of this process's queued and running jobs."""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE simulation_jobs SET heartbeat_at = ? WHERE owner = ? AND status IN ('queued', 'running')",
+                (self._now(), self.owner)
+            )
+
+    def expire_stale_jobs(self) -> int:
+        """
+        Mark queued or running jobs failed if their owner has not sent a heartbeat for stale_after seconds.
+        Jobs from before owners were recorded count from their creation time. Returns the number expired.
+        """
+        cutoff = (datetime.now() - timedelta(seconds=self.stale_after)).isoformat(timespec='seconds')
+        with self._connect() as conn:
+            cur = conn.execute(
+                "UPDATE simulation_jobs SET status = 'failed', error = 'interrupted', finished_at = ? "
+                "WHERE status IN ('queued', 'running') AND COALESCE(heartbeat_at, created_at) < ?",
+                (self._now(), cutoff)
+            )
+            return cur.rowcount
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the heartbeat and the worker threads."""
+        self._stopped.set()
+        self.executor.shutdown(wait=wait)
+
+    def _update(self, job_id: int, **fields) -> None:
+        assignments = ', '.join(f"{name} = ?" for name in fields)
+        with self._connect() as conn:
+            conn.execute(f"UPDATE simulation_jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def submit(self, league_id: int, simulations: int, seed: Optional[int] = None) -> int:
+        """Queue a simulation of the remaining season and return the job id."""
+        with self._connect() as conn:
+            cur = conn.execute(
+                "INSERT INTO simulation_jobs (league_id, simulations, seed, status, created_at, owner, heartbeat_at) "
+                "VALUES (?, ?, ?, 'queued', ?, ?, ?)",
+                (league_id, simulations, seed, self._now(), self.owner, self._now())
+            )
+            job_id = cur.lastrowid
+        self.executor.submit(self._run, job_id, league_id, simulations, seed)
+        return job_id
+
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        """Job status, progress and the latest snapshot, or None for an unknown id."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, league_id, simulations, seed, status, completed, cancel_requested, snapshot, error, "
+                "created_at, started_at, finished_at, owner, heartbeat_at FROM simulation_jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row[0],
+            "league_id": row[1],
+            "simulations": row[2],
+            "seed": row[3],
+            "status": row[4],
+            "completed": row[5],
+            "progress": row[5] / row[2] if row[2] else 0.0,
+            "cancel_requested": bool(row[6]),
+            "snapshot": json.loads(row[7]) if row[7] else None,
+            "error": row[8],
+            "created_at": row[9],
+            "started_at": row[10],
+            "finished_at": row[11],
+            "owner": row[12],
+            "heartbeat_at": row[13],
+        }
+
+    def cancel(self, job_id: int) -> bool:
+        """
+        Request cancellation. A queued job is cancelled at once, a running one after its current batch.
+        Returns False if the job does not exist or has already finished.
+        """
+        with self._connect() as conn:
+            cur = conn.execute(
+                "UPDATE simulation_jobs SET cancel_requested = 1 WHERE id = ? AND status IN ('queued', 'running')",
+                (job_id,)
+            )
+            if cur.rowcount == 0:
+                return False
+            conn.execute(
+                "UPDATE simulation_jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status = 'queued'",
+                (self._now(), job_id)
+            )
+        return True
+
+    def _start(self, job_id: int) -> bool:
+        """
+        Move a queued job to running. Returns False if it is no longer queued, i.e. it was
+        cancelled or expired before a worker thread picked it up.
+        """
+        with self._connect() as conn:
+            cur = conn.execute(
+                "UPDATE simulation_jobs SET status = 'running', started_at = ?, heartbeat_at = ? "
+                "WHERE id = ? AND status = 'queued'",
+                (self._now(), self._now(), job_id)
+            )
+            return cur.rowcount == 1
+
+    def _cancel_requested(self, job_id: int) -> bool:
+        with self._connect() as conn:
+            row = conn.execute("SELECT cancel_requested FROM simulation_jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row[0])
+
+    def _run(self, job_id: int, league_id: int, simulations: int, seed: Optional[int]) -> None:
+        if not self._start(job_id):
+            return
+
+        try:
+            sim = Simulator(league_id, elo_model=snapshot.load_or_fit(league_id))
+            schedule, state = sim.prepare_batch_model()
+            accumulator = RankAccumulator(schedule.teams)
+
+            def on_batch(acc):
+                self._update(job_id, completed=acc.n, snapshot=json.dumps(acc.snapshot()), heartbeat_at=self._now())
+                return not self._cancel_requested(job_id)
+
+            vectorized_sim.simulate(
+                accumulator, schedule, state, simulations,
+                np.random.default_rng(seed), self.batch_size, on_batch
+            )
+            status = 'cancelled' if accumulator.n < simulations else 'done'
+            self._update(job_id, status=status, finished_at=self._now())
+        except Exception as e:
+            self._update(job_id, status='failed', error=repr(e), finished_at=self._now())
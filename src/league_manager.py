@@ -1,7 +1,110 @@
+from collections.abc import Mapping
 from .elo_system import EloRatingSystem
 
+"""
+This module contains the LeagueManager class.
+
+By default every league gets its own EloRatingSystem, which loads and replays its own history.
+With shared=True, all leagues are loaded once into one columnar FixtureStore and replayed
+together, so a promoted or relegated team carries its rating across leagues: it starts from
+league_initial_ratings and each match is weighted by the league it was played in
+(league_weights). get_elo then returns a LeagueView, a per-league slice of that one model.
+"""
+
+
+class LeagueMapping(Mapping):
+    """
+    Read-only view of one of a model's per-team dicts (team_ratings, gains, ...), restricted to a set of teams.
+    The dict is looked up on the model on every access, so the view follows the model even if it reassigns it.
+    """
+
+    def __init__(self, model, name, teams):
+        self._model = model
+        self._name = name
+        self._teams = teams # Sorted list, for iteration order
+        self._team_set = frozenset(teams)
+
+    def __getitem__(self, team):
+        if team not in self._team_set:
+            raise KeyError(team)
+        return getattr(self._model, self._name)[team]
+
+    def __contains__(self, team):
+        return team in self._team_set and team in getattr(self._model, self._name)
+
+    def __iter__(self):
+        values = getattr(self._model, self._name)
+        return (team for team in self._teams if team in values)
+
+    def __len__(self):
+        values = getattr(self._model, self._name)
+        return sum(1 for team in self._teams if team in values)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(self)!r})"
+
+
+class LeagueView:
+    """
+    One league of a shared EloRatingSystem.
+
+    Ratings, strengths, form and gains are read-only LeagueMappings over the shared model's
+    dicts, so they stay in step with it at the cost of one set check per lookup; future
+    matches and the fixture store are sliced once. Anything else
+    (k_factor, calculate_match_probabilities, DataManager, ...) is the shared model's.
+    """
+
+    def __init__(self, model, league_id):
+        self.model = model
+        self.league_id = league_id
+
+        store = model.fixture_store
+        self.fixture_store = store.select(store.league_mask(league_id))
+        self.future_matches = {
+            season: {
+                rnd: [match for match in matches if match.league_id == league_id]
+                for rnd, matches in rounds.items()
+                if any(match.league_id == league_id for match in matches)
+            }
+            for season, rounds in model.future_matches.items()
+        }
+        self.teams = self._current_teams()
+        self.team_ratings = LeagueMapping(model, 'team_ratings', self.teams)
+        self.team_strengths = LeagueMapping(model, 'team_strengths', self.teams)
+        self.team_form = LeagueMapping(model, 'team_form', self.teams)
+        self.gains = LeagueMapping(model, 'gains', self.teams)
+
+    def _current_teams(self):
+        """Teams in the league's upcoming matches, or in its latest season if none are scheduled."""
+        teams = {
+            team
+            for rounds in self.future_matches.values()
+            for matches in rounds.values()
+            for match in matches
+            for team in (match.home_team, match.away_team)
+        }
+        store = self.fixture_store
+        if not teams and len(store):
+            latest = store.season == store.season[-1]
+            teams = {store.teams[i] for i in store.home[latest].tolist() + store.away[latest].tolist()}
+        return sorted(teams)
+
+    def __getattr__(self, name):
+        if name == 'model':
+            raise AttributeError(name)
+        return getattr(self.model, name)
+
+
 class LeagueManager:
-    def __init__(self, league_ids):
+    def __init__(self, league_ids, shared=False):
+        self.shared = shared
+        if shared:
+            self.model = EloRatingSystem(list(league_ids), columnar=True)
+            self.model.run_elo_rating_system()
+            self.leagues = {league_id: LeagueView(self.model, league_id) for league_id in league_ids}
+            return
+
+        self.model = None
         self.leagues = {
             league_id: EloRatingSystem(league_id) for league_id in league_ids
         }
@@ -12,4 +115,4 @@ class LeagueManager:
         return self.leagues.get(league_id)
 
     def all_leagues(self):
-        return list(self.leagues.keys())
\ No newline at end of file
+        return list(self.leagues.keys())
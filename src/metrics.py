@@ -0,0 +1,175 @@
+import contextlib
+import functools
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+"""
+This module contains the instrumentation used across DataManager, EloRatingSystem and Simulator.
+
+Features:
+- Timers (count and total seconds) and counters, with optional Prometheus labels.
+- A Prometheus text exposition of everything recorded, served by app.py at /metrics.
+- Per-request profiles (cProfile or pyinstrument), written by app.py to PROFILE_DIR.
+
+Instrumentation is switched on by setting FOOTBALL_METRICS=1 before the modules are imported.
+When it is off, `timed` returns the function unchanged and `timer`/`inc` do nothing, so the
+hot paths pay nothing for the decorators and one no-op call per timed block.
+
+Profiling is switched on separately with FOOTBALL_PROFILE=cprofile or FOOTBALL_PROFILE=pyinstrument.
+"""
+
+ENABLED = os.environ.get("FOOTBALL_METRICS", "").lower() in ("1", "true", "yes", "on")
+PROFILER = os.environ.get("FOOTBALL_PROFILE", "").lower() or None
+PROFILE_DIR = os.environ.get("FOOTBALL_PROFILE_DIR", "profiles")
+PREFIX = "football_"
+
+Key = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+_lock = threading.Lock()
+_timers: Dict[Key, list] = {} # key -> [count, total seconds]
+_counters: Dict[Key, float] = {}
+_null_timer = contextlib.nullcontext()
+
+
+def _key(name: str, labels: Dict[str, str]) -> Key:
+    return name, tuple(sorted((label, str(value)) for label, value in labels.items()))
+
+
+def _record(key: Key, seconds: float) -> None:
+    with _lock:
+        entry = _timers.get(key)
+        if entry is None:
+            entry = _timers[key] = [0, 0.0]
+        entry[0] += 1
+        entry[1] += seconds
+
+
+def observe(name: str, seconds: float, **labels) -> None:
+    """Record one timing of `seconds` under name{labels}."""
+    _record(_key(name, labels), seconds)
+
+
+def _inc(name: str, value: float = 1, **labels) -> None:
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+@contextlib.contextmanager
+def _timer(name: str, **labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def _noop(*args, **kwargs) -> None:
+    return None
+
+
+def _null(*args, **kwargs):
+    return _null_timer
+
+
+def timed(name: str, **labels):
+    """
+    Decorator recording each call's duration under name{labels}.
+    Returns the function itself when instrumentation is off.
+    """
+    def decorator(fn):
+        if not ENABLED:
+            return fn
+        key = _key(name, labels)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _record(key, time.perf_counter() - start)
+
+        return wrapper
+    return decorator
+
+
+# timer(name, **labels) is a context manager timing its block; inc(name, value, **labels) bumps a counter
+timer = _timer if ENABLED else _null
+inc = _inc if ENABLED else _noop
+
+
+def reset() -> None:
+    with _lock:
+        _timers.clear()
+        _counters.clear()
+
+
+def _format_labels(labels) -> str:
+    if not labels:
+        return ""
+    escape = lambda value: value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{label}="{escape(value)}"' for label, value in labels) + "}"
+
+
+def render_prometheus() -> str:
+    """All timers and counters in the Prometheus text exposition format."""
+    with _lock:
+        timers = {key: tuple(entry) for key, entry in _timers.items()}
+        counters = dict(_counters)
+
+    lines = []
+    for name in sorted({name for name, _ in timers}):
+        metric = f"{PREFIX}{name}_seconds"
+        lines.append(f"# TYPE {metric} summary")
+        for (key_name, labels), (count, total) in sorted(timers.items()):
+            if key_name == name:
+                lines.append(f"{metric}_count{_format_labels(labels)} {count}")
+                lines.append(f"{metric}_sum{_format_labels(labels)} {total:.9f}")
+    for name in sorted({name for name, _ in counters}):
+        metric = f"{PREFIX}{name}_total"
+        lines.append(f"# TYPE {metric} counter")
+        for (key_name, labels), value in sorted(counters.items()):
+            if key_name == name:
+                lines.append(f"{metric}{_format_labels(labels)} {value:g}")
+    return "\n".join(lines) + "\n"
+
+
+class RequestProfiler:
+    """Profiles one unit of work and writes the result to PROFILE_DIR."""
+
+    def __init__(self, profiler: Optional[str] = PROFILER, profile_dir: str = PROFILE_DIR):
+        if profiler not in ("cprofile", "pyinstrument"):
+            raise ValueError(f"Unknown profiler {profiler!r}, expected 'cprofile' or 'pyinstrument'")
+        self.profiler = profiler
+        self.profile_dir = profile_dir
+        self._profile = None
+
+    def start(self) -> None:
+        if self.profiler == "cprofile":
+            import cProfile
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            from pyinstrument import Profiler # Optional dependency, only needed for FOOTBALL_PROFILE=pyinstrument
+            self._profile = Profiler()
+            self._profile.start()
+
+    def stop(self, name: str) -> str:
+        """Stop profiling and write <name>-<timestamp>.prof (cProfile) or .html (pyinstrument). Returns the path."""
+        os.makedirs(self.profile_dir, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S") + f"-{time.time_ns() % 1_000_000_000:09d}"
+        safe_name = "".join(c if c.isalnum() or c in "-_" else "_" for c in name)
+        if self.profiler == "cprofile":
+            self._profile.disable()
+            path = os.path.join(self.profile_dir, f"{safe_name}-{stamp}.prof")
+            self._profile.dump_stats(path)
+        else:
+            self._profile.stop()
+            path = os.path.join(self.profile_dir, f"{safe_name}-{stamp}.html")
+            with open(path, "w") as f:
+                f.write(self._profile.output_html())
+        self._profile = None
+        return path
@@ -1,18 +1,217 @@
 import sqlite3
-from typing import Dict, List
+import weakref
+from typing import Callable, Dict, List, Optional
+from . import db
 
-def migrate_fixtures_to_sqlite(league_id: int, fixtures: Dict[str, Dict[str, List[Dict]]], db_path: str = "football.db"):
-    conn = sqlite3.connect(db_path)
-    c = conn.cursor()
+_fixture_listeners = []
 
+def register_fixtures_listener(callback: Callable[[int], None]) -> None:
+    """
+    Register a callback that is called with the league id whenever new fixtures are inserted.
+    Bound methods are held weakly, so registering does not keep their instance alive; the entry
+    is dropped as soon as the instance is collected.
+    """
+    if hasattr(callback, '__self__'):
+        ref = weakref.WeakMethod(callback, _discard_fixtures_listener)
+    else:
+        ref = lambda: callback
+    _fixture_listeners.append(ref)
+
+def _discard_fixtures_listener(ref) -> None:
+    try:
+        _fixture_listeners.remove(ref)
+    except ValueError:
+        pass
+
+def _notify_fixtures_listeners(league_id: int) -> None:
+    for ref in list(_fixture_listeners):
+        callback = ref()
+        if callback is not None:
+            callback(league_id)
+
+# Each entry moves the schema up one version (PRAGMA user_version).
+# Never edit an entry that has shipped; append a new one instead.
+SCHEMA_MIGRATIONS = [
+    # 1: base tables, for a fresh database
+    """
+    CREATE TABLE IF NOT EXISTS teams (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT,
+        league_id INTEGER,
+        home_strength REAL,
+        away_strength REAL,
+        elo_rating REAL
+    );
+    CREATE TABLE IF NOT EXISTS matches (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        league_id INTEGER,
+        season TEXT,
+        round TEXT,
+        date TEXT,
+        home_team TEXT,
+        away_team TEXT,
+        home_score INTEGER,
+        away_score INTEGER,
+        result TEXT
+    );
+    CREATE TABLE IF NOT EXISTS future_matches (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        league_id INTEGER,
+        season TEXT,
+        round TEXT,
+        date TEXT,
+        home_team TEXT,
+        away_team TEXT,
+        home_strength REAL,
+        away_strength REAL,
+        home_team_elo REAL,
+        away_team_elo REAL
+    );
+    CREATE TABLE IF NOT EXISTS table_standings (
+        league_id INTEGER,
+        team TEXT,
+        position INTEGER,
+        played_games INTEGER,
+        won INTEGER,
+        draw INTEGER,
+        lost INTEGER,
+        goals_for INTEGER,
+        goals_against INTEGER,
+        points INTEGER
+    );
+    """,
+    # 2: drop duplicate rows (keeping the latest fetch), add natural keys and lookup indexes
+    """
+    DELETE FROM matches WHERE id NOT IN (
+        SELECT MAX(id) FROM matches GROUP BY league_id, season, home_team, away_team, date
+    );
+    DELETE FROM future_matches WHERE id NOT IN (
+        SELECT MAX(id) FROM future_matches GROUP BY league_id, season, home_team, away_team
+    );
+    DELETE FROM teams WHERE id NOT IN (
+        SELECT MAX(id) FROM teams GROUP BY name
+    );
+    DELETE FROM table_standings WHERE rowid NOT IN (
+        SELECT MAX(rowid) FROM table_standings GROUP BY league_id, team
+    );
+
+    CREATE UNIQUE INDEX uq_matches_fixture ON matches (league_id, season, home_team, away_team, date);
+    CREATE UNIQUE INDEX uq_future_matches_fixture ON future_matches (league_id, season, home_team, away_team);
+    CREATE UNIQUE INDEX uq_teams_name ON teams (name);
+    CREATE UNIQUE INDEX uq_table_standings_team ON table_standings (league_id, team);
+
+    CREATE INDEX idx_matches_league_date ON matches (league_id, date);
+    CREATE INDEX idx_matches_teams ON matches (home_team, away_team);
+    CREATE INDEX idx_matches_league_season_round ON matches (league_id, season, round);
+    CREATE INDEX idx_future_matches_league_date ON future_matches (league_id, date);
+    CREATE INDEX idx_future_matches_league_season_round ON future_matches (league_id, season, round);
+    """,
+    # 3: Elo checkpoints for incremental runs, one per set of leagues
+    """
+    CREATE TABLE elo_checkpoints (
+        league_key TEXT PRIMARY KEY,
+        last_match_id INTEGER,
+        last_match_date TEXT,
+        k_factor REAL,
+        initial_rating REAL
+    );
+    CREATE TABLE elo_checkpoint_teams (
+        league_key TEXT,
+        team TEXT,
+        rating REAL,
+        gains TEXT,
+        PRIMARY KEY (league_key, team)
+    );
+    """,
+    # 4: data version stamp, bumped by any write to the tables the model reads
+    """
+    CREATE TABLE data_version (id INTEGER PRIMARY KEY CHECK (id = 1), version INTEGER NOT NULL);
+    INSERT INTO data_version (id, version) VALUES (1, 0);
+    """ + "".join(
+        f"""
+    CREATE TRIGGER bump_data_version_{table}_{event.lower()} AFTER {event} ON {table}
+    BEGIN
+        UPDATE data_version SET version = version + 1 WHERE id = 1;
+    END;
+    """
+        for table in ("matches", "future_matches", "teams", "table_standings")
+        for event in ("INSERT", "UPDATE", "DELETE")
+    ),
+    # 5: background simulation jobs
+    """
+    CREATE TABLE simulation_jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        league_id INTEGER,
+        simulations INTEGER,
+        seed INTEGER,
+        status TEXT,
+        completed INTEGER DEFAULT 0,
+        cancel_requested INTEGER DEFAULT 0,
+        snapshot TEXT,
+        error TEXT,
+        created_at TEXT,
+        started_at TEXT,
+        finished_at TEXT
+    );
+    CREATE INDEX idx_simulation_jobs_status ON simulation_jobs (status);
+    """,
+    # 6: owner and heartbeat of simulation jobs, so a worker only expires jobs whose owner is gone
+    """
+    ALTER TABLE simulation_jobs ADD COLUMN owner TEXT;
+    ALTER TABLE simulation_jobs ADD COLUMN heartbeat_at TEXT;
+    """,
+    # 7: what an Elo checkpoint was computed from, so edits to processed matches or strengths invalidate it
+    """
+    ALTER TABLE elo_checkpoints ADD COLUMN data_version INTEGER;
+    ALTER TABLE elo_checkpoints ADD COLUMN fingerprint TEXT;
+    """,
+]
+
+def _statements(script: str):
+    """The statements of script, one at a time (a trigger body stays whole)."""
+    statement = ""
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            yield statement
+            statement = ""
+
+def migrate_schema(db_path: Optional[str] = None) -> int:
+    """
+    Bring the database schema up to the latest version.
+    Each pending migration runs in its own transaction together with its user_version bump.
+    The transaction takes the write lock up front (BEGIN IMMEDIATE) and re-reads the version under it,
+    so two processes starting together never run the same step twice. A failing step is rolled back
+    before the error propagates, leaving the database at the previous version.
+
+    Returns:
+        int: The schema version after migrating.
+    """
+    conn = db.connect(db_path)
+    db.enable_wal(db_path) # Every write path migrates first
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+
+    while version < len(SCHEMA_MIGRATIONS):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version < len(SCHEMA_MIGRATIONS):
+                for statement in _statements(SCHEMA_MIGRATIONS[version]):
+                    conn.execute(statement)
+                version += 1
+                conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
+    return version
+
+def _fixture_rows(league_id: int, fixtures: Dict[str, Dict[str, List[Dict]]]):
     for season, rounds in fixtures.items():
         for round_name, games in rounds.items():
             for game in games:
-                c.execute('''
-                    INSERT INTO matches (
-                        league_id, season, round, date, home_team, away_team, home_score, away_score, result
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
+                yield (
                     league_id,
                     season,
                     round_name,
@@ -22,23 +221,13 @@ def migrate_fixtures_to_sqlite(league_id: int, fixtures: Dict[str, Dict[str, Lis
                     game["score"]["home"],
                     game["score"]["away"],
                     game["result"]
-                ))
-
-    conn.commit()
-    conn.close()
-
-def migrate_future_to_sqlite(league_id: int, future_matches: Dict[str, Dict[str, List[Dict]]], db_path: str = "football.db"):
-    conn = sqlite3.connect(db_path)
-    c = conn.cursor()
+                )
 
+def _future_rows(league_id: int, future_matches: Dict[str, Dict[str, List[Dict]]]):
     for season, rounds in future_matches.items():
         for round_name, games in rounds.items():
             for game in games:
-                c.execute('''
-                    INSERT INTO future_matches (
-                        league_id, season, round, date, home_team, away_team, home_strength, away_strength, home_team_elo, away_team_elo
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
+                yield (
                     league_id,
                     season,
                     round_name,
@@ -49,7 +238,50 @@ def migrate_future_to_sqlite(league_id: int, future_matches: Dict[str, Dict[str,
                     game["away_strength"],
                     game["home_team_elo"],
                     game["away_team_elo"]
-                ))
+                )
+
+def migrate_fixtures_to_sqlite(league_id: int, fixtures: Dict[str, Dict[str, List[Dict]]], db_path: Optional[str] = None):
+    """
+    Upsert finished fixtures into matches, in a single transaction.
+    A fixture already stored (same league, season, teams and date) gets its round and score updated.
+    """
+    migrate_schema(db_path)
+    conn = db.connect(db_path)
+    changes_before = conn.total_changes
+
+    with conn:
+        conn.executemany('''
+            INSERT INTO matches (
+                league_id, season, round, date, home_team, away_team, home_score, away_score, result
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (league_id, season, home_team, away_team, date) DO UPDATE SET
+                round = excluded.round,
+                home_score = excluded.home_score,
+                away_score = excluded.away_score,
+                result = excluded.result
+        ''', _fixture_rows(league_id, fixtures))
+
+    if conn.total_changes > changes_before:
+        _notify_fixtures_listeners(league_id)
+
+def migrate_future_to_sqlite(league_id: int, future_matches: Dict[str, Dict[str, List[Dict]]], db_path: Optional[str] = None):
+    """
+    Upsert future fixtures into future_matches, in a single transaction.
+    The key leaves out the date, so a rescheduled fixture is moved rather than duplicated.
+    """
+    migrate_schema(db_path)
+    conn = db.connect(db_path)
 
-    conn.commit()
-    conn.close()
+    with conn:
+        conn.executemany('''
+            INSERT INTO future_matches (
+                league_id, season, round, date, home_team, away_team, home_strength, away_strength, home_team_elo, away_team_elo
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (league_id, season, home_team, away_team) DO UPDATE SET
+                round = excluded.round,
+                date = excluded.date,
+                home_strength = excluded.home_strength,
+                away_strength = excluded.away_strength,
+                home_team_elo = excluded.home_team_elo,
+                away_team_elo = excluded.away_team_elo
+        ''', _future_rows(league_id, future_matches))
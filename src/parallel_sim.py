@@ -0,0 +1,67 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from . import vectorized_sim
+from .accumulator import RankAccumulator
+
+"""
+This module contains a process-pool runner around the batched simulation engine.
+
+The read-only model state (the compiled Schedule, ratings, form and gains) is
+sent to each worker once through the pool initializer. N simulations are split into
+fixed-size chunks, and every chunk draws from its own stream spawned from the master
+seed. Workers return RankAccumulators (rank histograms and point moments), which are
+merged. Chunking does not depend on the worker count, so a given master seed gives the
+same result for any number of workers.
+"""
+
+_worker_model = None
+
+
+def _init_worker(teams, schedule, state, track_quantiles):
+    global _worker_model
+    _worker_model = (teams, schedule, state, track_quantiles)
+
+
+def _run_chunk(size, seed_sequence):
+    teams, schedule, state, track_quantiles = _worker_model
+    rng = np.random.default_rng(seed_sequence)
+    accumulator = RankAccumulator(teams, track_quantiles)
+    return vectorized_sim.simulate(accumulator, schedule, state, size, rng, batch_size=size)
+
+
+def chunk_sizes(N, chunk_size):
+    """Split N simulations into chunks of at most chunk_size."""
+    return [min(chunk_size, N - start) for start in range(0, N, chunk_size)]
+
+
+def simulate_parallel(accumulator, schedule, state, N, seed=None, workers=None, chunk_size=10_000):
+    """
+    Run N simulations across a process pool and merge the results into the accumulator.
+
+    Parameters:
+        accumulator (RankAccumulator): Receives the merged results.
+        schedule (Schedule): The compiled fixtures and starting table.
+        state (tuple): Ratings, form and gains from vectorized_sim.initial_state.
+        N (int): Number of simulations.
+        seed (int): Master seed. Each chunk gets an independent child stream.
+        workers (int): Number of processes, defaults to the CPU count.
+        chunk_size (int): Simulations per chunk. Changing it changes the streams.
+
+    Returns:
+        RankAccumulator: The accumulator passed in.
+    """
+    sizes = chunk_sizes(N, chunk_size)
+    streams = np.random.SeedSequence(seed).spawn(len(sizes))
+    track_quantiles = accumulator.points_histogram is not None
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(sizes)) or 1,
+        initializer=_init_worker,
+        initargs=(accumulator.teams, schedule, state, track_quantiles),
+    ) as pool:
+        for chunk in pool.map(_run_chunk, sizes, streams):
+            accumulator.merge(chunk)
+
+    return accumulator
@@ -0,0 +1,108 @@
+import sys
+from typing import NamedTuple, Optional
+
+"""
+This module contains the immutable match records returned by DataManager.
+
+Matches used to be one dict per row, plus a nested dict for the score. These records are
+tuples with named fields (no per-instance dict), team names and other repeated strings are
+interned, so every match of a team shares one name object, and Score objects are shared
+between matches with the same scoreline.
+
+Records also answer match['home_team'], match['score']['home'], match.get(...), 'home_team' in match
+and keys(), all against the field names, so code written against the old dicts keeps working; hot
+paths use attribute access. Iterating a record still yields its values, as for any tuple.
+"""
+
+
+class _KeyAccess:
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            if key not in self._fields:
+                raise KeyError(key)
+            return getattr(self, key)
+        return tuple.__getitem__(self, key)
+
+    def __contains__(self, key):
+        return key in self._fields
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self._fields else default
+
+    def keys(self):
+        return self._fields
+
+
+class _ScoreFields(NamedTuple):
+    home: int
+    away: int
+
+
+class _MatchFields(NamedTuple):
+    season: str
+    round: str
+    date: str
+    home_team: str
+    away_team: str
+    score: "Score"
+    result: str
+    league_id: int
+    id: Optional[int] = None # Only set by DataManager.get_matches_since
+
+
+class _FutureMatchFields(NamedTuple):
+    season: str
+    round: str
+    date: str
+    home_team: str
+    away_team: str
+    home_strength: Optional[float]
+    away_strength: Optional[float]
+    home_team_elo: Optional[float]
+    away_team_elo: Optional[float]
+    league_id: int
+
+
+class Score(_KeyAccess, _ScoreFields):
+    __slots__ = ()
+
+
+class Match(_KeyAccess, _MatchFields):
+    __slots__ = ()
+
+
+class FutureMatch(_KeyAccess, _FutureMatchFields):
+    __slots__ = ()
+
+
+_scores = {}
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def score(home, away):
+    """The shared Score for a scoreline."""
+    key = (home, away)
+    record = _scores.get(key)
+    if record is None:
+        record = _scores[key] = Score(home, away)
+    return record
+
+
+def match_from_row(season, round_, date, home_team, away_team, home_score, away_score, result, league_id, id_=None):
+    return Match(
+        _intern(season), _intern(round_), _intern(date), _intern(home_team), _intern(away_team),
+        score(home_score, away_score), _intern(result), league_id, id_
+    )
+
+
+def future_match_from_row(season, round_, date, home_team, away_team, home_strength, away_strength,
+                          home_team_elo, away_team_elo, league_id):
+    return FutureMatch(
+        _intern(season), _intern(round_), _intern(date), _intern(home_team), _intern(away_team),
+        home_strength, away_strength, home_team_elo, away_team_elo, league_id
+    )
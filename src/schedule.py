@@ -0,0 +1,97 @@
+import numpy as np
+from . import helper
+
+"""
+This module contains the Schedule class, the compiled form of Simulator.future_matches
+that every simulation backend walks.
+
+future_matches is a season -> round -> list-of-records tree keyed by team name. A Schedule
+flattens it once per Simulator into per-match arrays indexed by integer team id, in
+schedule order:
+
+- home_idx, away_idx: team ids, with round_starts marking where each round begins
+- advantage: home advantage from the team strengths
+- decay, k_decay: the time decay of the match and k_factor * decay, the rating step
+- h2h_adjustment, p_home, p_home_or_draw: the model's probabilities for the match
+
+plus the starting table as an array of points per team id. Nothing in it changes during
+a simulated season, so the simulation loops only index arrays.
+"""
+
+
+class Schedule:
+    def __init__(self, teams, start_points, round_labels, round_starts, home_idx, away_idx, advantage, decay,
+                 k_decay, h2h_adjustment, p_home, p_home_or_draw):
+        self.teams = teams # Team names, indexed by team id: table order, then teams only in future matches
+        self.team_index = {team: i for i, team in enumerate(teams)}
+        self.start_points = start_points # Current table points per team id
+        self.round_labels = round_labels # (season, round) per round, in schedule order
+        self.round_starts = round_starts # Offset of each round's first match, plus the total match count
+        self.home_idx = home_idx
+        self.away_idx = away_idx
+        self.advantage = advantage
+        self.decay = decay
+        self.k_decay = k_decay
+        self.h2h_adjustment = h2h_adjustment
+        self.p_home = p_home
+        self.p_home_or_draw = p_home_or_draw
+
+    @classmethod
+    def compile(cls, simulator):
+        """Compile simulator.future_matches against simulator.elo_model."""
+        teams = simulator.get_team_order()
+        index = {team: i for i, team in enumerate(teams)}
+        table = helper.get_table(simulator.league_id, simulator.DataManager.db_path)
+
+        round_labels, round_starts = [], []
+        home_teams, away_teams, dates = [], [], []
+        for season, rounds in simulator.future_matches.items():
+            for round_name, matches in rounds.items():
+                round_labels.append((season, round_name))
+                round_starts.append(len(home_teams))
+                for match in matches:
+                    home_teams.append(match.home_team)
+                    away_teams.append(match.away_team)
+                    dates.append(match.date)
+        round_starts.append(len(home_teams))
+
+        hfa = np.array([simulator.home_strength.get(team, 0) for team in home_teams], dtype=float) * 100
+        afa = np.array([simulator.away_strength.get(team, 0) for team in away_teams], dtype=float) * 100
+        advantage = hfa + (hfa - afa) / 2
+
+        k_factor = simulator.k_factor
+        decay_table = helper.get_decay_table(k_factor, dates)
+        decay = np.array([decay_table[match_date] for match_date in dates], dtype=float)
+
+        h2h_adjustment = simulator.DataManager.get_h2h_adjustments(home_teams, away_teams, k_factor)
+        probabilities = simulator.elo_model.calculate_match_probabilities_batch(
+            home_teams, away_teams, advantage, h2h_adjustment
+        )
+
+        return cls(
+            teams,
+            np.array([table.get(team, 0) for team in teams], dtype=np.int64),
+            round_labels,
+            np.array(round_starts, dtype=np.intp),
+            np.array([index[team] for team in home_teams], dtype=np.intp),
+            np.array([index[team] for team in away_teams], dtype=np.intp),
+            advantage,
+            decay,
+            k_factor * decay,
+            h2h_adjustment,
+            probabilities['home_win'],
+            probabilities['home_win'] + probabilities['draw'],
+        )
+
+    def __len__(self):
+        return len(self.home_idx)
+
+    @property
+    def n_teams(self):
+        return len(self.teams)
+
+    def rounds(self):
+        """(season, round, slice) per round, in schedule order. The slice selects the round's matches."""
+        for (season, round_name), start, stop in zip(self.round_labels, self.round_starts[:-1].tolist(),
+                                                     self.round_starts[1:].tolist()):
+            yield season, round_name, slice(start, stop)
@@ -1,13 +1,34 @@
-import random
 import math
 from collections import deque
+from functools import cached_property
+import numpy as np
+from . import analytic_sim
 from . import helper
+from . import metrics
+from . import parallel_sim
+from . import vectorized_sim
+from .accumulator import RankAccumulator
 from .elo_system import EloRatingSystem
+from .schedule import Schedule
+
+# One row of Simulator.calculate_games
+GAME_DTYPE = np.dtype([
+    ('home_team', object),
+    ('away_team', object),
+    ('home_advantage', float),
+    ('h2h_adjustment', float),
+    ('home_win', float),
+    ('draw', float),
+    ('away_win', float),
+])
 
 class Simulator:
-    def __init__(self, league_id):
-        self.elo_model = EloRatingSystem(league_id)
-        self.elo_model.run_elo_rating_system()
+    def __init__(self, league_id, elo_model=None):
+        # elo_model can be a fitted model to reuse, e.g. LeagueManager(..., shared=True).get_elo(league_id)
+        if elo_model is None:
+            elo_model = EloRatingSystem(league_id)
+            elo_model.run_elo_rating_system()
+        self.elo_model = elo_model
         self.league_id = league_id
         self.k_factor = self.elo_model.k_factor
         self.DataManager = self.elo_model.DataManager
@@ -19,95 +40,171 @@ class Simulator:
             team: values['away'] for team, values in self.elo_model.team_strengths.items()
         }
 
-    def simulate_season_outcome_n_times(self, N=1000):
-        all_simulations = []
+    def get_team_order(self):
+        """Teams in table order, followed by any team that only appears in future matches."""
+        teams = list(helper.get_table(self.league_id, self.DataManager.db_path))
+        seen = set(teams)
+        for rounds in self.future_matches.values():
+            for matches in rounds.values():
+                for match in matches:
+                    for team in (match.home_team, match.away_team):
+                        if team not in seen:
+                            seen.add(team)
+                            teams.append(team)
+        return teams
+
+    @cached_property
+    def schedule(self):
+        """The future matches compiled once, see schedule.Schedule."""
+        return Schedule.compile(self)
+
+    @metrics.timed("simulation", backend="scalar")
+    def simulate_season_outcome_n_times(self, N=1000, seed=None, track_quantiles=False):
+        rng = np.random.default_rng(seed)
+
+        schedule = self.schedule
+        accumulator = RankAccumulator(schedule.teams, track_quantiles)
 
-        true_ratings = self.elo_model.team_ratings.copy()
-        true_form = self.elo_model.team_form.copy()
-        true_gains = {team: deque(self.elo_model.gains[team], maxlen=3) for team in self.elo_model.gains}
+        ratings, form, gains = vectorized_sim.initial_state(self.elo_model, schedule.teams)
+        true_ratings = ratings.tolist()
+        true_form = form.tolist()
+        true_gains = [deque(window, maxlen=3) for window in gains.tolist()] # Left-padded with zeros
+        start_points = schedule.start_points.tolist()
+
+        home_idx = schedule.home_idx.tolist()
+        away_idx = schedule.away_idx.tolist()
+        p_home = schedule.p_home.tolist()
+        p_home_or_draw = schedule.p_home_or_draw.tolist()
+        advantage = schedule.advantage.tolist()
+        decay = schedule.decay.tolist()
+        rounds = list(schedule.rounds())
+
+        weights = [math.log(i ** 2 + 1) for i in range(1, 4)]
+        total_weight = sum(weights)
+        normalized_weights = [w / total_weight for w in weights]
+
+        progress_every = max(1, N // 10) # Printing every run costs more than the run itself at large N
 
         for sim_number in range(1, N + 1):
+            if sim_number % progress_every == 0:
+                print(f"Simulating outcome {sim_number}/{N}...")
             temp_ratings = true_ratings.copy()
             temp_form = true_form.copy()
-            temp_gains = {team: deque(true_gains[team], maxlen=3) for team in true_gains}
-
-            team_points = helper.get_table(self.league_id)
-            print(f"Simulating outcome {sim_number}/{N}...")
-
-            for season, rounds in self.future_matches.items():
-                for round_name, matches in rounds.items():
-                    for match in matches:
-                        home_team = match['home_team']
-                        away_team = match['away_team']
-
-                        adjustment_factor = self.DataManager.get_h2h_adjustment(home_team, away_team, self.k_factor)
-
-                        home_rating = temp_ratings[home_team] + temp_form.get(home_team, 0) * 5
-                        away_rating = temp_ratings[away_team] + temp_form.get(away_team, 0) * 5
-
-                        hfa = self.home_strength.get(home_team, 0) * 100
-                        afa = self.away_strength.get(away_team, 0) * 100
-                        home_advantage = hfa + (hfa - afa) / 2
-
-                        probabilities = self.elo_model.calculate_match_probabilities(
-                            home_team, away_team, home_advantage, adjustment_factor
-                        )
-
-                        rand = random.random()
-                        if rand < probabilities['home_win']:
-                            team_points[home_team] += 3
-                            simulated_match = {'result': 'Home'}
-                        elif rand < probabilities['home_win'] + probabilities['draw']:
-                            team_points[home_team] += 1
-                            team_points[away_team] += 1
-                            simulated_match = {'result': 'Draw'}
-                        else:
-                            team_points[away_team] += 3
-                            simulated_match = {'result': 'Away'}
+            temp_gains = [deque(window, maxlen=3) for window in true_gains]
 
-                        expected_home = self.elo_model.calculate_expected_score(
-                            home_rating, away_rating, home_advantage)
-                        expected_away = 1 - expected_home
+            team_points = start_points.copy()
+            draws = rng.random(len(schedule)).tolist()
+
+            for season, round_name, matches in rounds:
+                with metrics.timer("simulation_round", backend="scalar"):
+                    for j in range(matches.start, matches.stop):
+                        h, a = home_idx[j], away_idx[j]
 
-                        if simulated_match['result'] == 'Home':
+                        home_rating = temp_ratings[h] + temp_form[h] * 5
+                        away_rating = temp_ratings[a] + temp_form[a] * 5
+
+                        rand = draws[j]
+                        if rand < p_home[j]:
+                            team_points[h] += 3
                             actual_home, actual_away = 1, 0
-                        elif simulated_match['result'] == 'Draw':
+                        elif rand < p_home_or_draw[j]:
+                            team_points[h] += 1
+                            team_points[a] += 1
                             actual_home = actual_away = 0.5
                         else:
+                            team_points[a] += 3
                             actual_home, actual_away = 0, 1
 
-                        decay_factor = helper.get_decay_factor(self.k_factor, match['date'])
+                        expected_home = self.elo_model.calculate_expected_score(home_rating, away_rating, advantage[j])
+                        expected_away = 1 - expected_home
+
+                        initial_rating_home = temp_ratings[h]
+                        initial_rating_away = temp_ratings[a]
                         new_rating_home = self.elo_model.update_rating(
-                            temp_ratings[home_team], actual_home, expected_home, decay_factor)
+                            self.k_factor, initial_rating_home, actual_home, expected_home, decay[j])
                         new_rating_away = self.elo_model.update_rating(
-                            temp_ratings[away_team], actual_away, expected_away, decay_factor)
+                            self.k_factor, initial_rating_away, actual_away, expected_away, decay[j])
+
+                        temp_ratings[h] = new_rating_home
+                        temp_ratings[a] = new_rating_away
+                        temp_gains[h].append(new_rating_home - initial_rating_home)
+                        temp_gains[a].append(new_rating_away - initial_rating_away)
+
+                        for team in (h, a):
+                            temp_form[team] = sum(g * w for g, w in zip(temp_gains[team], normalized_weights))
+
+            accumulator.update_batch(np.array([team_points]))
 
-                        initial_rating_home = temp_ratings[home_team]
-                        initial_rating_away = temp_ratings[away_team]
-                        gain_home = new_rating_home - initial_rating_home
-                        gain_away = new_rating_away - initial_rating_away
+        metrics.inc("simulations", N, backend="scalar")
+        return self.report(accumulator)
 
-                        temp_ratings[home_team] = new_rating_home
-                        temp_ratings[away_team] = new_rating_away
+    def prepare_batch_model(self):
+        """The compiled schedule and starting ratings, form and gains for the batched engines."""
+        schedule = self.schedule
+        return schedule, vectorized_sim.initial_state(self.elo_model, schedule.teams)
 
-                        temp_gains[home_team].append(gain_home)
-                        temp_gains[away_team].append(gain_away)
+    def report(self, accumulator):
+        """Print the rank distribution and return the accumulator snapshot."""
+        snapshot = accumulator.snapshot()
+        print(f"Simulated {snapshot['simulations']} remaining outcomes.")
+        print(helper.print_rank_probability_distribution(snapshot))
+        return snapshot
 
-                        weights = [math.log(i ** 2 + 1) for i in range(1, 4)]
-                        total_weight = sum(weights)
-                        normalized_weights = [w / total_weight for w in weights]
+    @metrics.timed("simulation", backend="vectorized")
+    def simulate_season_outcome_vectorized(self, N=1000, seed=None, batch_size=10_000, track_quantiles=False):
+        """
+        Batched NumPy version of simulate_season_outcome_n_times.
 
-                        for team in [home_team, away_team]:
-                            gains = list(temp_gains[team])
-                            if len(gains) < 3:
-                                gains = [0] * (3 - len(gains)) + gains
-                            temp_form[team] = sum(g * w for g, w in zip(gains, normalized_weights))
+        Gives the same rank distribution as the scalar path for the same seed.
+        """
+        schedule, state = self.prepare_batch_model()
+        accumulator = RankAccumulator(schedule.teams, track_quantiles)
+        vectorized_sim.simulate(
+            accumulator, schedule, state, N, np.random.default_rng(seed), batch_size
+        )
+        metrics.inc("simulations", N, backend="vectorized")
+        return self.report(accumulator)
+
+    @metrics.timed("simulation", backend="parallel")
+    def simulate_season_outcome_parallel(self, N=1000, seed=None, workers=None, chunk_size=10_000, track_quantiles=False):
+        """
+        Run the batched engine across a process pool.
+
+        Reproducible for a given seed and chunk_size, whatever the number of workers.
+        """
+        schedule, state = self.prepare_batch_model()
+        accumulator = RankAccumulator(schedule.teams, track_quantiles)
+        parallel_sim.simulate_parallel(
+            accumulator, schedule, state, N, seed, workers, chunk_size
+        )
+        metrics.inc("simulations", N, backend="parallel")
+        return self.report(accumulator)
 
-            all_simulations.append(team_points)
+    @metrics.timed("simulation", backend="analytic")
+    def simulate_season_outcome_analytic(self):
+        """
+        Exact points distributions and estimated position probabilities, without sampling.
+        See analytic_sim for what is exact and what is approximated.
+        """
+        schedule = self.schedule
+        pmf = analytic_sim.points_distributions(schedule)
+        snapshot = analytic_sim.summarize(schedule.teams, pmf, analytic_sim.rank_distributions(pmf))
+        print(helper.print_rank_probability_distribution(snapshot))
+        return snapshot
 
-        print(f"Simulated {N} remaining outcomes.")
-        print(all_simulations)
-        print(helper.print_rank_probability_distribution(all_simulations))
+    def compare_with_monte_carlo(self, N=10_000, seed=None):
+        """Run both the analytic and the vectorized Monte Carlo path and report the drift between them."""
+        analytic = self.simulate_season_outcome_analytic()
+        monte_carlo = self.simulate_season_outcome_vectorized(N, seed)
+        report = analytic_sim.drift(analytic, monte_carlo)
+        for name, value in report.items():
+            print(f"  {name}: {value:.3f}")
+        return report
+
+    def simulate_season_return_avg_points(self, N=1000, seed=None):
+        """Expected final points per team, sorted from most to fewest."""
+        snapshot = self.simulate_season_outcome_vectorized(N, seed)
+        return dict(sorted(snapshot['mean_points'].items(), key=lambda x: x[1], reverse=True))
 
     def calculate_specific_game(self, home_team, away_team):
         home_rating = self.elo_model.team_ratings.get(home_team, self.elo_model.initial_rating) + self.elo_model.team_form.get(home_team, 0)
@@ -127,3 +224,54 @@ class Simulator:
         print(f"  Home Win: {probabilities['home_win'] * 100:.2f}%")
         print(f"  Draw: {probabilities['draw'] * 100:.2f}%")
         print(f"  Away Win: {probabilities['away_win'] * 100:.2f}%")
+
+    def calculate_games(self, home_teams, away_teams):
+        """
+        calculate_specific_game for many (home, away) pairs in one vectorized call, without printing.
+
+        Returns:
+            np.ndarray: A structured array with one row per pair and the fields of GAME_DTYPE.
+        """
+        home_teams, away_teams = list(home_teams), list(away_teams)
+
+        hfa = np.array([self.home_strength.get(team, 0) for team in home_teams], dtype=float) * 100
+        afa = np.array([self.away_strength.get(team, 0) for team in away_teams], dtype=float) * 100
+        home_advantage = hfa + (hfa - afa) / 2
+
+        adjustment_factor = self.DataManager.get_h2h_adjustments(home_teams, away_teams, self.k_factor) * 25
+
+        probabilities = self.elo_model.calculate_match_probabilities_batch(
+            home_teams, away_teams, home_advantage, adjustment_factor
+        )
+
+        games = np.zeros(len(home_teams), dtype=GAME_DTYPE)
+        games['home_team'] = home_teams
+        games['away_team'] = away_teams
+        games['home_advantage'] = home_advantage
+        games['h2h_adjustment'] = adjustment_factor
+        for outcome in ('home_win', 'draw', 'away_win'):
+            games[outcome] = probabilities[outcome]
+        return games
+
+    def price_future_matches(self, season=None, round_name=None):
+        """
+        calculate_games for every upcoming fixture, or those of one season and/or round.
+
+        Returns:
+            List[Dict]: One entry per fixture in schedule order: season, round, date, league_id
+            and the fields of calculate_games.
+        """
+        fixtures = [
+            (season_name, rnd, match)
+            for season_name, rounds in self.future_matches.items() if season is None or season_name == season
+            for rnd, matches in rounds.items() if round_name is None or rnd == round_name
+            for match in matches
+        ]
+        games = self.calculate_games(
+            [match.home_team for _, _, match in fixtures], [match.away_team for _, _, match in fixtures]
+        )
+        return [
+            {'season': season_name, 'round': rnd, 'date': match.date, 'league_id': match.league_id,
+             **dict(zip(GAME_DTYPE.names, game))}
+            for (season_name, rnd, match), game in zip(fixtures, games.tolist())
+        ]
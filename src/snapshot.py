@@ -0,0 +1,207 @@
+import json
+import os
+import threading
+from collections import deque
+import numpy as np
+from . import db
+from . import helper
+from .elo_system import EloRatingSystem
+from .fixture_store import FIXED_REFERENCE_DATE, FixtureStore
+from .records import future_match_from_row
+
+"""
+This module contains save/load of a fitted EloRatingSystem as a NumPy .npz snapshot.
+
+A snapshot holds everything a fitted model keeps in memory: ratings, form, gain deques,
+strengths, the FixtureStore columns (team index, season/round labels, per-match arrays and
+the precomputed log ages) and the future matches. Loading one is a handful of array reads,
+no SQL beyond the data version check and no replay.
+
+Snapshots are versioned against the database: the data_version counter (bumped by any write
+to the tables the model reads), the database file and the model parameters are stored with
+the arrays, and a snapshot that does not match is treated as missing.
+"""
+
+FORMAT_VERSION = 2
+SNAPSHOT_DIR = os.environ.get("FOOTBALL_SNAPSHOT_DIR", ".snapshots")
+
+STORE_COLUMNS = ('home', 'away', 'home_score', 'away_score', 'league_id', 'season', 'round', 'day')
+FUTURE_FIELDS = ('home_strength', 'away_strength', 'home_team_elo', 'away_team_elo')
+
+
+def _league_ids(league_ids):
+    return sorted([league_ids] if isinstance(league_ids, int) else league_ids)
+
+
+def snapshot_path(league_ids, k_factor=3, snapshot_dir=None, fused=False, initial_rating=1500):
+    league_key = '-'.join(str(league_id) for league_id in _league_ids(league_ids))
+    mode = "-fused" if fused else ""
+    return os.path.join(
+        snapshot_dir or SNAPSHOT_DIR, f"elo-{league_key}-k{k_factor:g}-r{initial_rating:g}{mode}.npz"
+    )
+
+
+def _database_id(db_path):
+    return os.path.abspath(db.get_manager(db_path).db_path)
+
+
+def _float(value):
+    return np.nan if value is None else value
+
+
+def _optional(value):
+    return None if np.isnan(value) else float(value)
+
+
+def _metadata(model):
+    db_path = model.DataManager.db_path
+    return {
+        'format': FORMAT_VERSION,
+        'data_version': helper.get_data_version(db_path),
+        'database': _database_id(db_path),
+        'league_ids': _league_ids(model.DataManager.league_ids),
+        'k_factor': model.k_factor,
+        'initial_rating': model.initial_rating,
+        'fused': model.fused, # Form and gains come from the replay itself, see EloRatingSystem.process_season_with_form
+        'league_initial_ratings': list(model.league_initial_ratings.items()),
+        'league_weights': list(model.league_weights.items()),
+    }
+
+
+def save_snapshot(model, path):
+    """Write a fitted EloRatingSystem to path (.npz). Returns the path."""
+    store = model.fixture_store if model.fixture_store is not None else model.DataManager.get_fixture_store()
+    teams = sorted(set(model.team_ratings) | set(model.team_form) | set(model.gains) | set(model.team_strengths))
+    gains = np.full((len(teams), 3), np.nan)
+    for i, team in enumerate(teams):
+        values = list(model.gains.get(team, ()))
+        gains[i, :len(values)] = values
+
+    future = [
+        (season, rnd, match)
+        for season, rounds in model.future_matches.items()
+        for rnd, matches in rounds.items()
+        for match in matches
+    ]
+
+    arrays = {
+        'metadata': np.array(json.dumps(_metadata(model))),
+        'teams': np.array(teams, dtype=str),
+        'has_rating': np.array([team in model.team_ratings for team in teams]),
+        'ratings': np.array([model.team_ratings.get(team, np.nan) for team in teams], dtype=float),
+        'has_form': np.array([team in model.team_form for team in teams]),
+        'form': np.array([model.team_form.get(team, np.nan) for team in teams], dtype=float),
+        'has_gains': np.array([team in model.gains for team in teams]),
+        'gains': gains,
+        'has_strength': np.array([team in model.team_strengths for team in teams]),
+        'home_strength': np.array([_float(model.team_strengths.get(team, {}).get('home')) for team in teams], dtype=float),
+        'away_strength': np.array([_float(model.team_strengths.get(team, {}).get('away')) for team in teams], dtype=float),
+        'store_teams': np.array(store.teams, dtype=str),
+        'store_seasons': np.array(store.seasons, dtype=str),
+        'store_rounds': np.array(store.rounds, dtype=str),
+        'store_dates': np.array(store.dates.tolist(), dtype=str),
+        'store_log_ages': store.log_ages(True),
+        'future_season': np.array([season for season, _, _ in future], dtype=str),
+        'future_round': np.array([rnd for _, rnd, _ in future], dtype=str),
+        'future_date': np.array([match.date for _, _, match in future], dtype=str),
+        'future_home': np.array([match.home_team for _, _, match in future], dtype=str),
+        'future_away': np.array([match.away_team for _, _, match in future], dtype=str),
+        'future_league_id': np.array([match.league_id for _, _, match in future], dtype=np.int32),
+    }
+    for name in STORE_COLUMNS:
+        arrays[f'store_{name}'] = getattr(store, name)
+    for name in FUTURE_FIELDS:
+        arrays[f'future_{name}'] = np.array([_float(getattr(match, name)) for _, _, match in future], dtype=float)
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp.npz"
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, path) # Readers never see a half-written snapshot
+    return path
+
+
+def is_current(metadata, league_ids, k_factor=3, initial_rating=1500, db_path=None, fused=False):
+    """
+    True if a snapshot's metadata matches these parameters and the database as it is now.
+    Never true for an unmigrated database, which has no data version to compare.
+    """
+    data_version = helper.get_data_version(db_path)
+    return (
+        data_version is not None
+        and metadata.get('format') == FORMAT_VERSION
+        and metadata.get('league_ids') == _league_ids(league_ids)
+        and metadata.get('k_factor') == k_factor
+        and metadata.get('initial_rating') == initial_rating
+        and metadata.get('fused') == fused
+        and metadata.get('database') == _database_id(db_path)
+        and metadata.get('data_version') == data_version
+    )
+
+
+def load_snapshot(path, league_ids, k_factor=3, initial_rating=1500, db_path=None, fused=False):
+    """
+    Load a model saved by save_snapshot.
+
+    Returns:
+        EloRatingSystem: The fitted model (columnar), or None if there is no snapshot at path
+        or it was taken from other parameters or an older version of the database.
+    """
+    if not os.path.exists(path):
+        return None
+    with np.load(path, allow_pickle=False) as data:
+        metadata = json.loads(data['metadata'].item())
+        if not is_current(metadata, league_ids, k_factor, initial_rating, db_path, fused):
+            return None
+        arrays = {name: data[name] for name in data.files}
+
+    teams = arrays['teams'].tolist()
+    team_ratings = {
+        team: float(rating) for team, rating, has in zip(teams, arrays['ratings'], arrays['has_rating']) if has
+    }
+    team_form = {team: float(form) for team, form, has in zip(teams, arrays['form'], arrays['has_form']) if has}
+    gains = {
+        team: deque((float(g) for g in row if not np.isnan(g)), maxlen=3)
+        for team, row, has in zip(teams, arrays['gains'], arrays['has_gains']) if has
+    }
+    team_strengths = {
+        team: {'home': _optional(home), 'away': _optional(away)}
+        for team, home, away, has in zip(teams, arrays['home_strength'], arrays['away_strength'], arrays['has_strength'])
+        if has
+    }
+
+    store = FixtureStore(
+        arrays['store_teams'].tolist(), arrays['store_seasons'].tolist(), arrays['store_rounds'].tolist(),
+        *(arrays[f'store_{name}'] for name in STORE_COLUMNS),
+        arrays['store_dates'].astype(object),
+    )
+    store._log_ages[FIXED_REFERENCE_DATE] = arrays['store_log_ages']
+
+    future = {}
+    extra = {name: arrays[f'future_{name}'].tolist() for name in FUTURE_FIELDS}
+    for i, (season, rnd, match_date, home, away, league_id) in enumerate(zip(
+            arrays['future_season'].tolist(), arrays['future_round'].tolist(), arrays['future_date'].tolist(),
+            arrays['future_home'].tolist(), arrays['future_away'].tolist(), arrays['future_league_id'].tolist())):
+        match = future_match_from_row(
+            season, rnd, match_date, home, away, *(_optional(extra[name][i]) for name in FUTURE_FIELDS), league_id
+        )
+        future.setdefault(season, {}).setdefault(rnd, []).append(match)
+
+    model = EloRatingSystem.from_state(
+        league_ids, team_ratings, team_form, gains, team_strengths, store, future,
+        initial_rating, k_factor, db_path, fused=fused
+    )
+    model.league_initial_ratings = {league_id: rating for league_id, rating in metadata['league_initial_ratings']}
+    model.league_weights = {league_id: weight for league_id, weight in metadata['league_weights']}
+
+    return model
+
+
+def load_or_fit(league_ids, k_factor=3, initial_rating=1500, snapshot_dir=None, fused=False):
+    """Load the current snapshot for these leagues, or fit the model from the default database and save one."""
+    path = snapshot_path(league_ids, k_factor, snapshot_dir, fused, initial_rating)
+    model = load_snapshot(path, league_ids, k_factor, initial_rating, fused=fused)
+    if model is None:
+        model = EloRatingSystem(league_ids, initial_rating, k_factor, columnar=True, fused=fused)
+        model.run_elo_rating_system()
+        save_snapshot(model, path)
+    return model
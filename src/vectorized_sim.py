@@ -0,0 +1,109 @@
+import math
+import numpy as np
+from . import helper
+from . import metrics
+
+"""
+This module contains the batched NumPy engine behind Simulator.simulate_season_outcome_vectorized.
+
+Instead of looping over simulations, every simulation is a row in a set of arrays
+(points, ratings, gains and form indexed by team id) and the fixture list is walked once,
+updating all rows at the same time.
+
+Everything that does not depend on the simulated results (match probabilities, H2H
+adjustments, home advantage and decay factors) comes precomputed from the Simulator's Schedule.
+Uniform draws are taken row by row from a NumPy Generator, so a seeded run gives exactly
+the same outcomes as Simulator.simulate_season_outcome_n_times with the same seed.
+"""
+
+FORM_WEIGHTS = np.array([math.log(i ** 2 + 1) for i in range(1, 4)])
+FORM_WEIGHTS = FORM_WEIGHTS / FORM_WEIGHTS.sum()
+
+
+def initial_state(elo_model, teams):
+    """Starting ratings, form and left-padded gain windows for every team id."""
+    ratings = np.array([elo_model.team_ratings.get(team, elo_model.initial_rating) for team in teams], dtype=float)
+    form = np.array([elo_model.team_form.get(team, 0) for team in teams], dtype=float)
+    gains = np.zeros((len(teams), 3))
+    for i, team in enumerate(teams):
+        recent = list(elo_model.gains.get(team, ()))
+        if recent:
+            gains[i, 3 - len(recent):] = recent
+    return ratings, form, gains
+
+
+def simulate_batch(schedule, ratings, form, gains, draws):
+    """
+    Simulate one batch of seasons.
+
+    Parameters:
+        schedule (Schedule): The compiled fixtures and starting table.
+        ratings, form (np.ndarray): Starting ratings and form per team id, shape (T,).
+        gains (np.ndarray): Starting gain windows per team id, shape (T, 3).
+        draws (np.ndarray): Uniform draws, shape (B, M), one row per simulation.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Final points and ratings, each shape (B, T).
+    """
+    n_sims = draws.shape[0]
+    points = np.tile(schedule.start_points, (n_sims, 1))
+    ratings = np.tile(ratings, (n_sims, 1))
+    form = np.tile(form, (n_sims, 1))
+    gains = np.tile(gains, (n_sims, 1, 1))
+
+    home_idx = schedule.home_idx
+    away_idx = schedule.away_idx
+    p_home = schedule.p_home
+    p_home_or_draw = schedule.p_home_or_draw
+    advantage = schedule.advantage
+    k_decay = schedule.k_decay
+
+    for j in range(draws.shape[1]):
+        h, a = home_idx[j], away_idx[j]
+        rand = draws[:, j]
+
+        home_win = rand < p_home[j]
+        draw = ~home_win & (rand < p_home_or_draw[j])
+        away_win = ~(home_win | draw)
+
+        points[:, h] += 3 * home_win + draw
+        points[:, a] += 3 * away_win + draw
+
+        home_rating = ratings[:, h] + form[:, h] * 5
+        away_rating = ratings[:, a] + form[:, a] * 5
+        expected_home = helper.expected_scores(home_rating, away_rating, advantage[j])
+        actual_home = home_win + 0.5 * draw
+
+        gain_home = k_decay[j] * (actual_home - expected_home)
+        gain_away = -gain_home
+
+        ratings[:, h] += gain_home
+        ratings[:, a] += gain_away
+
+        for team, gain in ((h, gain_home), (a, gain_away)):
+            window = gains[:, team]
+            window[:, :-1] = window[:, 1:]
+            window[:, -1] = gain
+            form[:, team] = window @ FORM_WEIGHTS
+
+    return points, ratings
+
+
+def simulate(accumulator, schedule, state, N, rng, batch_size=10_000, on_batch=None):
+    """
+    Run N simulations in batches, feeding each batch's final points into the accumulator.
+    on_batch, if given, is called with the accumulator after every batch; returning False stops the run.
+    """
+    ratings, form, gains = state
+    n_matches = len(schedule)
+
+    for start in range(0, N, batch_size):
+        size = min(batch_size, N - start)
+        with metrics.timer("simulation_batch", backend="vectorized"):
+            draws = rng.random((size, n_matches))
+            points, _ = simulate_batch(schedule, ratings, form, gains, draws)
+        accumulator.update_batch(points)
+        if on_batch is not None and on_batch(accumulator) is False:
+            break
+
+    return accumulator
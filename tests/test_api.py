@@ -0,0 +1,120 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from src.api import FixtureFetcher
+
+"""
+FixtureFetcher against a local stand-in for the fixtures API (http.server in a thread).
+"""
+
+
+class StandInAPI(ThreadingHTTPServer):
+    """
+    Answers GET /fixtures?league=..&season=.. after a short delay, with an ETag per pair.
+
+    - rate_limited: pairs whose first request gets 429 with Retry-After
+    - requests: (league, season, If-None-Match) per request, in arrival order
+    - peak: the most requests in flight at once
+    """
+    daemon_threads = True
+
+    def __init__(self, delay=0.2, rate_limited=()):
+        super().__init__(("127.0.0.1", 0), StandInHandler)
+        self.delay = delay
+        self.rate_limited = set(rate_limited)
+        self.requests = []
+        self.in_flight = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/fixtures"
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        query = parse_qs(urlparse(self.path).query)
+        pair = (int(query["league"][0]), int(query["season"][0]))
+        etag = f'"{pair[0]}-{pair[1]}"'
+        with server.lock:
+            server.requests.append((*pair, self.headers.get("If-None-Match")))
+            server.in_flight += 1
+            server.peak = max(server.peak, server.in_flight)
+            rate_limited = pair in server.rate_limited
+            server.rate_limited.discard(pair)
+        try:
+            time.sleep(server.delay)
+            if rate_limited:
+                self.send_response(429)
+                self.send_header("Retry-After", "0")
+                self.end_headers()
+            elif self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+            else:
+                body = json.dumps({"league": pair[0], "season": pair[1], "response": []}).encode()
+                self.send_response(200)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stand_in(request):
+    server = StandInAPI(**getattr(request, "param", {}))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_fetcher(server, cache_dir):
+    return FixtureFetcher(api_url=server.url, api_token="test", requests_per_second=0, backoff=0.01,
+                          cache_dir=str(cache_dir))
+
+
+def test_fetch_all_keeps_every_pair_in_flight(stand_in, tmp_path):
+    league_ids, seasons = [103, 104, 105], [2021, 2022, 2023, 2024, 2025]
+
+    responses = make_fetcher(stand_in, tmp_path).fetch_all(league_ids, seasons)
+
+    assert len(stand_in.requests) == 15
+    assert stand_in.peak == 15
+    assert responses == {
+        (league_id, season): {"league": league_id, "season": season, "response": []}
+        for league_id in league_ids for season in seasons
+    }
+
+
+@pytest.mark.parametrize("stand_in", [{"delay": 0, "rate_limited": [(103, 2024)]}], indirect=True)
+def test_fetch_retries_after_429(stand_in, tmp_path):
+    data = make_fetcher(stand_in, tmp_path).fetch(103, 2024)
+
+    assert data == {"league": 103, "season": 2024, "response": []}
+    assert stand_in.requests == [(103, 2024, None), (103, 2024, None)]
+
+
+@pytest.mark.parametrize("stand_in", [{"delay": 0}], indirect=True)
+def test_fetch_revalidates_cached_response_by_etag(stand_in, tmp_path):
+    first = make_fetcher(stand_in, tmp_path).fetch(103, 2024)
+    second = make_fetcher(stand_in, tmp_path).fetch(103, 2024)
+
+    assert second == first == {"league": 103, "season": 2024, "response": []}
+    assert stand_in.requests == [(103, 2024, None), (103, 2024, '"103-2024"')]
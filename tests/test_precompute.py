@@ -0,0 +1,14 @@
+from benchmarks.check_precompute import max_errors, random_samples
+
+"""
+The memoized decay and expected-score helpers against the exact formulas they replace
+(see benchmarks/check_precompute.py for the timing side).
+"""
+
+TOLERANCE = 1e-12
+
+
+def test_helpers_match_exact_formulas():
+    errors = max_errors(*random_samples(20_000))
+
+    assert {name: error for name, error in errors.items() if error > TOLERANCE} == {}